@@ -1,73 +1,11 @@
 import tkinter as tk
-from tkinter import simpledialog, messagebox
-from pymodbus.client.sync import ModbusTcpClient
-import threading
-import time
-
-class CustomDialog(simpledialog.Dialog):
-    def __init__(self, parent, title=None):
-        self.ip_address = ""
-        self.port = ""
-        self.coil_numbers = ""
-        super().__init__(parent, title)
-
-    def body(self, master):
-        tk.Label(master, text="IP Address:").grid(row=0)
-        tk.Label(master, text="Port:").grid(row=1)
-        tk.Label(master, text="Coil Numbers (comma separated):").grid(row=2)
-        
-        self.ip_entry = tk.Entry(master)
-        self.port_entry = tk.Entry(master)
-        self.coils_entry = tk.Entry(master)
-
-        self.ip_entry.insert(0, "10.3.200.10")
-        self.port_entry.insert(0, "502")
-        self.coils_entry.insert(0, "8192,8193,8194,8195")
-
-        self.ip_entry.bind("<FocusIn>", self.clear_ip_placeholder)
-        self.port_entry.bind("<FocusIn>", self.clear_port_placeholder)
-        self.coils_entry.bind("<FocusIn>", self.clear_coils_placeholder)
-
-        self.ip_entry.grid(row=0, column=1)
-        self.port_entry.grid(row=1, column=1)
-        self.coils_entry.grid(row=2, column=1)
-
-        return self.ip_entry
-
-    def clear_ip_placeholder(self, event):
-        if self.ip_entry.get() == "Enter IP address":
-            self.ip_entry.delete(0, tk.END)
-
-    def clear_port_placeholder(self, event):
-        if self.port_entry.get() == "Enter port number":
-            self.port_entry.delete(0, tk.END)
-
-    def clear_coils_placeholder(self, event):
-        if self.coils_entry.get() == "8192,8193,8194,8195":
-            self.coils_entry.delete(0, tk.END)
-
-    def apply(self):
-        self.ip_address = self.ip_entry.get()
-        self.port = int(self.port_entry.get())
-        self.coil_numbers = list(map(int, self.coils_entry.get().split(',')))
-
-class ModbusApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Modbus Coil Control")
-        
-        dialog = CustomDialog(self.root, title="Modbus Settings")
-        self.ip_address = dialog.ip_address
-        self.port = dialog.port
-        self.coil_numbers = dialog.coil_numbers
-        
-        self.modbus_client = ModbusTcpClient(self.ip_address, self.port)
-        if not self.modbus_client.connect():
-            messagebox.showerror("Connection Error", "Failed to connect to Modbus server")
-            self.root.destroy()
-            return
-        
-        self.buttons = []
+from tkinter import messagebox
+from pusher_gui import ChannelControls, ChannelList, ModbusAppBase, command_line_profile
+
+class ModbusApp(ChannelControls, ModbusAppBase):
+    on_color = "green"
+
+    def create_interface(self):
         self.create_widgets()
         self.create_buttons()
 
@@ -80,7 +18,7 @@ class ModbusApp:
 
         self.duration_label = tk.Label(self.duration_frame, text="Duration (seconds):")
         self.duration_label.pack(side=tk.LEFT, padx=10)
-        
+
         self.duration_entry = tk.Entry(self.duration_frame)
         self.duration_entry.insert(0, "60")
         self.duration_entry.pack(side=tk.LEFT, padx=10)
@@ -89,6 +27,10 @@ class ModbusApp:
         self.automatic_button.pack(pady=10)
 
     def create_buttons(self):
+        if self.use_coil_grid():
+            self.create_coil_grid(self.button_frame)
+            return
+
         self.canvas = tk.Canvas(self.button_frame, width=500, height=500)
         self.canvas.pack(pady=20)
 
@@ -100,50 +42,22 @@ class ModbusApp:
             btn = self.canvas.create_oval(x, y, x+button_size, y+button_size, fill="#F70D1A", outline="black")
             self.canvas.create_text(x + button_size / 2, y - 20, text=f"Button {i+1}", font=("Arial", 12))
             self.canvas.create_text(x + button_size / 2, y + button_size + 20, text=f"Coil {coil}", font=("Arial", 12))
-            self.buttons.append((btn, coil, self.canvas))
+            self.register_button(btn, coil, self.canvas)
             self.canvas.tag_bind(btn, "<Button-1>", lambda event, c=coil, b=btn: self.toggle_coil(c, b))
 
-        self.update_button_colors()
-
     def toggle_coil(self, coil, btn):
         try:
             duration = float(self.duration_entry.get())
         except ValueError:
             messagebox.showerror("Invalid input", "Please enter a valid duration in seconds.")
             return
-        
-        thread = threading.Thread(target=self.toggle_coil_thread, args=(coil, btn, duration))
-        thread.start()
-
-    def toggle_coil_thread(self, coil, btn, duration):
-        try:
-            current_state = self.modbus_client.read_coils(coil, 1).bits[0]
-            self.modbus_client.write_coil(coil, not current_state)
-            self.update_button_color(btn, not current_state)
-            time.sleep(duration)
-            self.modbus_client.write_coil(coil, current_state)
-            self.update_button_color(btn, current_state)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-
-    def update_button_colors(self):
-        for btn, coil, canvas in self.buttons:
-            try:
-                current_state = self.modbus_client.read_coils(coil, 1).bits[0]
-                self.update_button_color(btn, current_state)
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-    
-    def update_button_color(self, btn, state):
-        color = "green" if state else "#F70D1A"
-        for canvas, item in [(canvas, item) for item, coil, canvas in self.buttons if item == btn]:
-            canvas.itemconfig(item, fill=color)
 
+        self.press_scheduler.press(coil, duration)
 
     def open_automatic_control(self):
         self.auto_control_window = tk.Toplevel(self.root)
         self.auto_control_window.title("Automatic Control Settings")
-        
+
         tk.Label(self.auto_control_window, text="Select Button:").grid(row=0, column=0, pady=10, padx=10)
         self.button_var = tk.StringVar(value="Button 1")
         self.button_dropdown = tk.OptionMenu(self.auto_control_window, self.button_var, *["Button " + str(i+1) for i in range(len(self.coil_numbers))])
@@ -152,59 +66,41 @@ class ModbusApp:
         tk.Label(self.auto_control_window, text="Press Duration (seconds):").grid(row=1, column=0, pady=10, padx=10)
         self.press_duration_entry = tk.Entry(self.auto_control_window)
         self.press_duration_entry.grid(row=1, column=1, pady=10, padx=10)
-        
+
         tk.Label(self.auto_control_window, text="Wait Duration (seconds):").grid(row=2, column=0, pady=10, padx=10)
         self.wait_duration_entry = tk.Entry(self.auto_control_window)
         self.wait_duration_entry.grid(row=2, column=1, pady=10, padx=10)
 
+        tk.Label(self.auto_control_window, text="Phase (seconds):").grid(row=3, column=0, pady=10, padx=10)
+        self.phase_entry = tk.Entry(self.auto_control_window)
+        self.phase_entry.insert(0, "0")
+        self.phase_entry.grid(row=3, column=1, pady=10, padx=10)
+
         self.loop_var = tk.IntVar(value=0)
         self.loop_checkbox = tk.Checkbutton(self.auto_control_window, text="Loop", variable=self.loop_var)
-        self.loop_checkbox.grid(row=3, columnspan=2, pady=10, padx=10)
+        self.loop_checkbox.grid(row=4, columnspan=2, pady=10, padx=10)
 
-        self.start_auto_button = tk.Button(self.auto_control_window, text="Start", command=self.start_automatic_control)
-        self.start_auto_button.grid(row=4, column=0, pady=10, padx=10)
+        self.add_channel_button = tk.Button(self.auto_control_window, text="Add Channel", command=self.add_channel)
+        self.add_channel_button.grid(row=5, columnspan=2, pady=10, padx=10)
 
-        self.stop_auto_button = tk.Button(self.auto_control_window, text="Stop", command=self.stop_automatic_control)
-        self.stop_auto_button.grid(row=4, column=1, pady=10, padx=10)
+        self.channel_list = ChannelList(self.auto_control_window, self.coil_numbers)
+        self.channel_list.grid(row=6, columnspan=2, pady=10, padx=10)
 
-    def start_automatic_control(self):
-        try:
-            press_duration = float(self.press_duration_entry.get())
-            wait_duration = float(self.wait_duration_entry.get())
-        except ValueError:
-            messagebox.showerror("Invalid input", "Please enter valid durations in seconds.")
-            return
-        
-        button_index = int(self.button_var.get().split()[-1]) - 1
-        coil = self.coil_numbers[button_index]
-        self.auto_control_running = True
+        self.start_auto_button = tk.Button(self.auto_control_window, text="Start", command=self.start_automatic_control)
+        self.start_auto_button.grid(row=7, column=0, pady=10, padx=10)
 
-        def auto_control():
-            while self.auto_control_running:
-                self.toggle_coil_thread(coil, self.buttons[button_index][0], press_duration)
-                time.sleep(wait_duration)
-                if not self.loop_var.get():
-                    break
+        self.stop_auto_button = tk.Button(self.auto_control_window, text="Stop", command=self.stop_automatic_control)
+        self.stop_auto_button.grid(row=7, column=1, pady=10, padx=10)
 
-        self.auto_control_thread = threading.Thread(target=auto_control)
-        self.auto_control_thread.start()
+        self.dry_run_button = tk.Button(self.auto_control_window, text="Dry Run", command=self.dry_run_automatic_control)
+        self.dry_run_button.grid(row=8, columnspan=2, pady=10, padx=10)
 
     def stop_automatic_control(self):
-        self.auto_control_running = False
-        if hasattr(self, 'auto_control_thread') and self.auto_control_thread.is_alive():
-            threading.Thread(target=self.auto_control_thread.join).start()
-            for _, coil, _ in self.buttons:
-                self.modbus_client.write_coil(coil, False)
-                self.update_button_colors()
-
-
-
-    def on_closing(self):
-        self.modbus_client.close()
-        self.root.destroy()
+        # also while a started runner is still waiting for the previous one to be released
+        self.stop_all()
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = ModbusApp(root)
+    app = ModbusApp(root, command_line_profile())
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
@@ -0,0 +1,108 @@
+import argparse
+import threading
+import time
+from coil_batch import read_coil_states, release_coils
+from coil_cache import VerifiedCoilCache
+from modbus_connection import ModbusConnection
+from modbus_sim import SimulatedPLC
+from press_engine import SequenceRunner
+from press_scheduler import PressScheduler
+
+SIZES = (4, 32, 512)
+FIRST_COIL = 8192
+
+
+class CountingConnection(ModbusConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transactions = 0
+        self.count_lock = threading.Lock()
+
+    def execute(self, method, *args, **kwargs):
+        with self.count_lock:
+            self.transactions += 1
+        return super().execute(method, *args, **kwargs)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(connection, operation, iterations, budget):
+    samples = []
+    before = connection.transactions
+    started = time.perf_counter()
+    while len(samples) < iterations and (len(samples) < 3 or time.perf_counter() - started < budget):
+        op_started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+    return {
+        "round_trips": (connection.transactions - before) / len(samples),
+        "p50": percentile(samples, 0.50),
+        "p99": percentile(samples, 0.99),
+        "ops": len(samples) / elapsed,
+    }
+
+
+def scenarios(connection, scheduler, cached_scheduler, coils):
+    # the cached scheduler's cache is confirmed by one read, as the coil monitor would
+    cache = cached_scheduler.cache
+    cache.verify(read_coil_states(connection, coils), cache.clock())
+    return [
+        ("refresh", lambda: read_coil_states(connection, coils)),
+        ("single press", lambda: scheduler.press(coils[0], 0).result()),
+        ("cached press", lambda: cached_scheduler.press(coils[0], 0).result()),
+        ("sequence cycle", lambda: SequenceRunner(connection, coils, 0, 0, cycles=1).run()),
+        ("bulk stop", lambda: release_coils(connection, coils)),
+    ]
+
+
+def run(host, port, sizes, iterations, budget, first_coil=FIRST_COIL):
+    connection = CountingConnection(host, port)
+    if not connection.connect():
+        raise SystemExit(f"Failed to connect to Modbus server {host}:{port}")
+    scheduler = PressScheduler(connection)
+    cached_scheduler = PressScheduler(connection, cache=VerifiedCoilCache(trusted=True))
+    results = []
+    try:
+        for size in sizes:
+            coils = list(range(first_coil, first_coil + size))
+            for name, operation in scenarios(connection, scheduler, cached_scheduler, coils):
+                results.append((name, size, measure(connection, operation, iterations, budget)))
+    finally:
+        scheduler.close()
+        cached_scheduler.close()
+        connection.close()
+    return results
+
+
+def print_results(results):
+    print(f"{'scenario':<16}{'coils':>6}{'round trips':>13}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    for name, size, stats in results:
+        print(f"{name:<16}{size:>6}{stats['round_trips']:>13.1f}{stats['p50'] * 1000:>10.2f}"
+              f"{stats['p99'] * 1000:>10.2f}{stats['ops']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark refresh, press, sequence and stop throughput")
+    parser.add_argument("--host", default=None, help="benchmark a real device instead of the local simulator")
+    parser.add_argument("--port", type=int, default=502)
+    parser.add_argument("--first-coil", type=int, default=FIRST_COIL)
+    parser.add_argument("--sizes", type=lambda text: list(map(int, text.split(','))), default=list(SIZES))
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated per-request latency (seconds)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--budget", type=float, default=2.0, help="maximum seconds spent on one scenario")
+    args = parser.parse_args(argv)
+
+    if args.host:
+        results = run(args.host, args.port, args.sizes, args.iterations, args.budget, args.first_coil)
+    else:
+        with SimulatedPLC(latency=args.latency) as plc:
+            results = run(plc.host, plc.port, args.sizes, args.iterations, args.budget, args.first_coil)
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
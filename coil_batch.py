@@ -0,0 +1,69 @@
+from pymodbus.exceptions import ModbusIOException
+
+# Modbus limit for a single read_coils (FC01) request
+MAX_COILS_PER_READ = 2000
+# Unused coils we are willing to over-read instead of sending another request.
+# A coil costs one bit on the wire, so bridging is almost always cheaper than a round trip.
+DEFAULT_MAX_GAP = 64
+
+
+def plan_coil_ranges(coils, max_gap=DEFAULT_MAX_GAP, max_count=MAX_COILS_PER_READ):
+    ranges = []
+    for coil in sorted(set(coils)):
+        if ranges:
+            start, count = ranges[-1]
+            if coil - (start + count) <= max_gap and coil - start < max_count:
+                ranges[-1] = (start, coil - start + 1)
+                continue
+        ranges.append((coil, 1))
+    return ranges
+
+
+def read_coil_states(client, coils, max_gap=DEFAULT_MAX_GAP):
+    wanted = set(coils)
+    states = {}
+    for start, count in plan_coil_ranges(wanted, max_gap):
+        result = client.read_coils(start, count)
+        if result.isError():
+            raise ModbusIOException(f"read_coils({start}, {count}) failed: {result}")
+        for offset in range(count):
+            if start + offset in wanted:
+                states[start + offset] = bool(result.bits[offset])
+    return states
+
+
+# Modbus limit for a single write_coils (FC15) request
+MAX_COILS_PER_WRITE = 1968
+
+
+def plan_coil_writes(states, max_count=MAX_COILS_PER_WRITE):
+    # Unlike reads, gaps are never bridged: that would overwrite coils we do not own.
+    runs = []
+    for coil in sorted(states):
+        if runs:
+            start, values = runs[-1]
+            if coil == start + len(values) and len(values) < max_count:
+                values.append(bool(states[coil]))
+                continue
+        runs.append((coil, [bool(states[coil])]))
+    return runs
+
+
+def write_coil_states(client, states):
+    write_coil_runs(client, plan_coil_writes(states))
+
+
+def write_coil_runs(client, runs):
+    for start, values in runs:
+        if len(values) == 1:
+            result = client.write_coil(start, values[0])
+        else:
+            result = client.write_coils(start, values)
+        if result.isError():
+            raise ModbusIOException(f"write_coils({start}, {len(values)}) failed: {result}")
+
+
+def release_coils(client, coils, max_gap=DEFAULT_MAX_GAP):
+    coils = set(coils)
+    write_coil_states(client, dict.fromkeys(coils, False))
+    return read_coil_states(client, coils, max_gap)
@@ -0,0 +1,80 @@
+import threading
+import time
+
+# seconds a batched read keeps vouching for a coil's cached state
+MAX_AGE = 5.0
+
+
+# Last known state of every coil, shared by the refresh path and the press workers.
+# update() returns only the coils whose state actually changed, so callers repaint just those.
+class CoilStateCache:
+    def __init__(self):
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def get(self, coil, default=None):
+        with self.lock:
+            return self.states.get(coil, default)
+
+    def update(self, states):
+        changed = {}
+        with self.lock:
+            for coil, state in states.items():
+                state = bool(state)
+                if self.states.get(coil) != state:
+                    self.states[coil] = state
+                    changed[coil] = state
+        return changed
+
+
+# Coil states a press may trust instead of reading the coil first (only while trusted is set).
+# Our own writes are recorded by wrote() right away and checked by verify() against the next
+# batched read. A coil without a recent confirming read is not trusted: get() returns None and
+# the caller falls back to reading it. verify() reports every cached state the read contradicts.
+class VerifiedCoilCache:
+    def __init__(self, trusted=False, max_age=MAX_AGE, clock=time.monotonic):
+        self.trusted = trusted
+        self.max_age = max_age
+        self.clock = clock
+        self.states = {}
+        self.verified_at = {}
+        self.written_at = {}
+        self.lock = threading.Lock()
+
+    def get(self, coil):
+        if not self.trusted:
+            return None
+        with self.lock:
+            verified = self.verified_at.get(coil)
+            if verified is None or self.clock() - verified > self.max_age:
+                return None
+            return self.states[coil]
+
+    def wrote(self, states):
+        now = self.clock()
+        with self.lock:
+            for coil, state in states.items():
+                self.states[coil] = bool(state)
+                self.written_at[coil] = now
+
+    def verify(self, states, started):
+        # states come from a read sent at clock() == started; returns {coil: (cached, read)} for stale coils
+        stale = {}
+        with self.lock:
+            for coil, state in states.items():
+                state = bool(state)
+                if self.written_at.get(coil, started - 1) >= started:
+                    # written while the read was in flight: the next read decides
+                    continue
+                cached = self.states.get(coil)
+                if cached is not None and cached != state:
+                    stale[coil] = (cached, state)
+                self.states[coil] = state
+                self.verified_at[coil] = started
+                self.written_at.pop(coil, None)
+        return stale
+
+
+def stale_message(coil, cached, state):
+    return (f"Coil {coil} reads {'ON' if state else 'OFF'} but was cached as {'ON' if cached else 'OFF'}; "
+            f"cache corrected")
@@ -0,0 +1,101 @@
+import tkinter as tk
+
+# Row height and column width of one coil cell in the grid (pixels)
+CELL_WIDTH = 110
+CELL_HEIGHT = 100
+BUTTON_SIZE = 60
+
+
+# Scrollable grid for large coil maps. Canvas items exist only for the rows on screen (plus one);
+# scrolling moves and relabels those cells instead of creating more. Clicks go through one
+# canvas binding that maps the pointer to a coil. state_of(coil) gives the colour of a cell
+# that scrolls into view, and on_visible(coils) is told whenever the visible set changes.
+class CoilGrid(tk.Frame):
+    def __init__(self, master, coils, on_click, state_of, on_visible=None, columns=4, height=420,
+                 on_color="#039b4e", off_color="#F70D1A"):
+        super().__init__(master)
+        self.coils = list(coils)
+        self.on_click = on_click
+        self.state_of = state_of
+        self.on_visible = on_visible
+        self.columns = columns
+        self.on_color = on_color
+        self.off_color = off_color
+        self.cells = []
+        self.visible = {}
+        rows = -(-len(self.coils) // columns)
+
+        self.canvas = tk.Canvas(self, width=columns * CELL_WIDTH, height=height,
+                                scrollregion=(0, 0, columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.scroll)
+        self.canvas.config(yscrollcommand=self.scrollbar.set)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas.bind("<Configure>", lambda event: self.layout())
+        self.canvas.bind("<Button-1>", self.click)
+        self.canvas.bind("<MouseWheel>", lambda event: self.scroll("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll("scroll", 1, "units"))
+
+    def scroll(self, *args):
+        self.canvas.yview(*args)
+        self.layout()
+
+    def layout(self):
+        first_row = max(0, int(self.canvas.canvasy(0) // CELL_HEIGHT))
+        rows = self.canvas.winfo_height() // CELL_HEIGHT + 2
+        while len(self.cells) < rows * self.columns:
+            self.cells.append(self.create_cell())
+
+        visible = {}
+        for slot, cell in enumerate(self.cells):
+            index = first_row * self.columns + slot
+            if index >= len(self.coils):
+                for item in cell:
+                    self.canvas.itemconfig(item, state=tk.HIDDEN)
+                continue
+            coil = self.coils[index]
+            visible[coil] = cell
+            self.place_cell(cell, index, coil)
+
+        changed = visible.keys() != self.visible.keys()
+        self.visible = visible
+        if changed and self.on_visible:
+            self.on_visible(list(visible))
+
+    def create_cell(self):
+        oval = self.canvas.create_oval(0, 0, BUTTON_SIZE, BUTTON_SIZE, fill=self.off_color, outline="black")
+        label = self.canvas.create_text(0, 0, font=("Arial", 9))
+        address = self.canvas.create_text(0, 0, font=("Arial", 9))
+        return oval, label, address
+
+    def place_cell(self, cell, index, coil):
+        oval, label, address = cell
+        x = (index % self.columns) * CELL_WIDTH + (CELL_WIDTH - BUTTON_SIZE) / 2
+        y = (index // self.columns) * CELL_HEIGHT + (CELL_HEIGHT - BUTTON_SIZE) / 2
+        self.canvas.coords(oval, x, y, x + BUTTON_SIZE, y + BUTTON_SIZE)
+        self.canvas.coords(label, x + BUTTON_SIZE / 2, y - 9)
+        self.canvas.coords(address, x + BUTTON_SIZE / 2, y + BUTTON_SIZE + 9)
+        self.canvas.itemconfig(oval, state=tk.NORMAL, fill=self.on_color if self.state_of(coil) else self.off_color)
+        self.canvas.itemconfig(label, state=tk.NORMAL, text=f"Button {index + 1}")
+        self.canvas.itemconfig(address, state=tk.NORMAL, text=f"Coil {coil}")
+
+    def paint(self, states):
+        # only coils on screen have items; the rest are painted when they scroll into view
+        for coil, state in states.items():
+            cell = self.visible.get(coil)
+            if cell:
+                self.canvas.itemconfig(cell[0], fill=self.on_color if state else self.off_color)
+
+    def click(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        column, row = int(x // CELL_WIDTH), int(y // CELL_HEIGHT)
+        index = row * self.columns + column
+        if column >= self.columns or index >= len(self.coils):
+            return
+        # only the oval itself is a button, like in the small layouts
+        cx = column * CELL_WIDTH + CELL_WIDTH / 2
+        cy = row * CELL_HEIGHT + CELL_HEIGHT / 2
+        if (x - cx) ** 2 + (y - cy) ** 2 <= (BUTTON_SIZE / 2) ** 2:
+            self.on_click(self.coils[index])
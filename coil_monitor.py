@@ -0,0 +1,101 @@
+import threading
+import time
+from coil_batch import plan_coil_ranges, read_coil_states
+from coil_cache import stale_message
+from register_batch import plan_register_ranges, read_register_values
+from transaction_scheduler import POLL
+
+FAST_INTERVAL = 0.2
+IDLE_INTERVAL = 2.0
+ERROR_INTERVAL = 5.0
+# read_coils requests per second this monitor may send to one device
+DEFAULT_BUDGET = 10.0
+
+
+# Polls the coils in batched reads on a background thread and posts ("states", {coil: state})
+# to the events queue. Polls fast while active() is true, then backs off towards IDLE_INTERVAL.
+# Every poll also verifies the optional coil_cache.VerifiedCoilCache, and reads the optional
+# register_batch.RegisterChannel list, posted as ("registers", {name: values}).
+class CoilMonitor:
+    def __init__(self, connection, coils, events, active=None, budget=DEFAULT_BUDGET,
+                 fast_interval=FAST_INTERVAL, idle_interval=IDLE_INTERVAL, cache=None, registers=()):
+        self.connection = connection
+        self.coils = list(coils)
+        self.registers = list(registers)
+        self.events = events
+        self.cache = cache
+        self.active = active or (lambda: False)
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.set_budget(budget)
+        self.interval = self.fast_interval
+        self.failing = False
+        self.running = False
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def set_budget(self, budget):
+        # a poll costs one request per planned range; never poll faster than the budget allows
+        self.budget = budget
+        requests = len(plan_coil_ranges(self.coils)) + len(plan_register_ranges(self.registers))
+        self.min_interval = requests / budget if budget else 0.0
+
+    def set_coils(self, coils):
+        # e.g. the coils currently on screen; polled as soon as the budget allows
+        self.coils = list(coils)
+        self.set_budget(self.budget)
+        self.wake()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def wake(self):
+        self.interval = self.fast_interval
+        self.wakeup.set()
+
+    def run(self):
+        last_poll = next_poll = time.monotonic()
+        while self.running:
+            delay = next_poll - time.monotonic()
+            if delay > 0 and self.wakeup.wait(delay):
+                self.wakeup.clear()
+                # woken early: poll as soon as the budget allows
+                next_poll = max(last_poll + self.min_interval, time.monotonic())
+                continue
+            if not self.running:
+                break
+            last_poll = time.monotonic()
+            with self.connection.priority(POLL):
+                self.poll()
+            next_poll = last_poll + max(self.interval, self.min_interval)
+
+    def poll(self):
+        started = time.monotonic()
+        try:
+            states = read_coil_states(self.connection, self.coils)
+            values = read_register_values(self.connection, self.registers) if self.registers else None
+        except Exception as e:
+            if not self.failing:
+                self.events.put(("error", f"Coil monitor: {e}"))
+            self.failing = True
+            self.interval = ERROR_INTERVAL
+            return
+        self.failing = False
+        if self.cache:
+            stale = self.cache.verify(states, started)
+            if self.cache.trusted:
+                for coil, (cached, state) in sorted(stale.items()):
+                    self.events.put(("error", stale_message(coil, cached, state)))
+        self.events.put(("states", states))
+        if values is not None:
+            self.events.put(("registers", values))
+        if self.active():
+            self.interval = self.fast_interval
+        else:
+            self.interval = min(self.interval * 1.5, self.idle_interval)
@@ -0,0 +1,63 @@
+import threading
+import time
+from modbus_connection import MAX_RECONNECT_DELAY, RECONNECT_DELAY
+from transaction_scheduler import POLL
+
+# A heartbeat is only sent when nothing else got an answer from the device for this long (seconds)
+HEARTBEAT_INTERVAL = 1.0
+
+
+# Keeps an eye on one device. Whenever the link has been quiet for interval seconds it sends a
+# one-coil heartbeat read at poll priority. The link going down or coming back is posted as
+# ("link", up) to events; while it is down, the heartbeat retries with backoff, and every
+# attempt also reopens the pooled socket it used. up is a threading.Event for anyone waiting.
+class ConnectionWatchdog:
+    def __init__(self, connection, address, events=None, interval=HEARTBEAT_INTERVAL):
+        self.connection = connection
+        self.address = address
+        self.events = events
+        self.interval = interval
+        self.up = threading.Event()
+        self.known = False
+        self.outages = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def wait_up(self, timeout=None):
+        return self.up.wait(timeout)
+
+    def run(self):
+        # the first heartbeat goes out at once, so this also opens the connection
+        delay = 0.0
+        while not self.stop_event.wait(delay):
+            quiet = time.monotonic() - self.connection.last_response
+            if self.up.is_set() and quiet < self.interval:
+                delay = self.interval - quiet
+                continue
+            with self.connection.priority(POLL):
+                alive = self.connection.probe(self.address)
+            if alive:
+                delay = self.interval
+                if not self.up.is_set():
+                    self.up.set()
+                    self.changed(True)
+            else:
+                delay = RECONNECT_DELAY if self.up.is_set() else min(max(delay * 2, RECONNECT_DELAY),
+                                                                     MAX_RECONNECT_DELAY)
+                if self.up.is_set() or not self.known:
+                    self.outages += self.up.is_set()
+                    self.up.clear()
+                    self.changed(False)
+
+    def changed(self, up):
+        self.known = True
+        if self.events is not None:
+            self.events.put(("link", up))
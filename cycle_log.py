@@ -0,0 +1,192 @@
+import csv
+import glob
+import math
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+
+# Rows waiting for the writer thread; when it falls this far behind, new rows are dropped
+# (and counted) instead of growing memory or blocking a control thread
+DEFAULT_QUEUE_SIZE = 65536
+# a file is closed and the next one started once it reaches this size
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# rows written per batch; a columnar file holds one block per batch
+BATCH_SIZE = 4096
+# seconds of rows a crash may lose: buffers are flushed at least this often
+FLUSH_INTERVAL = 1.0
+
+KINDS = ("edge", "read", "error")
+EDGE, READ, ERROR = range(3)
+# time: wall clock (s), cycle: pass of the runner (per channel for loops), state: commanded for
+# edges and read back for reads, offset: the edge's deadline from the start of the run (s),
+# lateness: how far behind that deadline the write completed (s), latency: Modbus round trip (s)
+COLUMNS = ("time", "kind", "cycle", "coil", "state", "offset", "lateness", "latency")
+TYPECODES = ("d", "B", "I", "I", "B", "d", "f", "f")
+NAN = float("nan")
+
+# Columnar block: magic and row count, then every column as a little-endian array, then the
+# messages of the block's rows as NUL-separated UTF-8 (empty except for errors).
+BLOCK = struct.Struct("<4sI")
+MAGIC = b"CYC1"
+MESSAGES = struct.Struct("<I")
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", buffering=1 << 16)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS + ("message",))
+
+    def write(self, rows):
+        self.writer.writerows(
+            (f"{row[0]:.6f}", KINDS[row[1]], row[2], row[3], int(row[4]),
+             *("" if math.isnan(value) else f"{value:.6f}" for value in row[5:8]), row[8])
+            for row in rows)
+
+
+class ColumnWriter:
+    def __init__(self, path):
+        self.file = open(path, "wb", buffering=1 << 16)
+
+    def write(self, rows):
+        self.file.write(BLOCK.pack(MAGIC, len(rows)))
+        for index, typecode in enumerate(TYPECODES):
+            column = array(typecode, [row[index] for row in rows])
+            if sys.byteorder == "big":
+                column.byteswap()
+            self.file.write(column.tobytes())
+        messages = "\0".join(row[8] for row in rows).encode()
+        self.file.write(MESSAGES.pack(len(messages)) + messages)
+
+
+# Streams cycle results to files from its own thread. edge(), read() and error() only queue a
+# tuple, so a control thread never waits for the disk. Files are numbered, e.g. soak.000.csv,
+# soak.001.csv, ...; a .cyc extension selects the compact columnar format, anything else CSV.
+class CycleLog:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, max_files=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.base, self.extension = os.path.splitext(path)
+        self.writer_class = ColumnWriter if self.extension == ".cyc" else CsvWriter
+        self.max_bytes = max_bytes
+        # oldest files are deleted beyond this many (None keeps them all)
+        self.max_files = max_files
+        self.queue = queue.Queue(queue_size)
+        # True makes put() wait for room instead of dropping; only for producers without deadlines
+        self.block = False
+        self.rows = 0
+        self.dropped = 0
+        self.reported_drops = 0
+        self.index = -1
+        self.paths = []
+        self.writer = None
+        self.next_file()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def edge(self, cycle, coil, state, offset, lateness, latency):
+        self.put((time.time(), EDGE, cycle, coil, state, offset, lateness, latency, ""))
+
+    def read(self, cycle, coil, state, latency):
+        self.put((time.time(), READ, cycle, coil, state, NAN, NAN, latency, ""))
+
+    def error(self, message):
+        self.put((time.time(), ERROR, 0, 0, 0, NAN, NAN, NAN, message))
+
+    def put(self, row):
+        try:
+            self.queue.put(row, self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                row = self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                row = ()
+            rows = [row] if row else []
+            while row is not None and len(rows) < BATCH_SIZE:
+                try:
+                    row = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is not None:
+                    rows.append(row)
+            if self.dropped != self.reported_drops:
+                dropped, self.reported_drops = self.dropped - self.reported_drops, self.dropped
+                rows.append((time.time(), ERROR, 0, 0, 0, NAN, NAN, NAN, f"{dropped} rows dropped, log queue full"))
+            if rows:
+                self.writer.write(rows)
+                self.rows += len(rows)
+            if row is None:
+                self.writer.file.close()
+                return
+            if self.writer.file.tell() >= self.max_bytes:
+                self.next_file()
+            elif time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                self.writer.file.flush()
+                last_flush = time.monotonic()
+
+    def next_file(self):
+        if self.writer is not None:
+            self.writer.file.close()
+        self.index += 1
+        path = f"{self.base}.{self.index:03d}{self.extension}"
+        self.writer = self.writer_class(path)
+        self.paths.append(path)
+        if self.max_files is not None and len(self.paths) > self.max_files:
+            os.remove(self.paths.pop(0))
+
+
+def cycle_log_files(path):
+    # the numbered files of a CycleLog started as path, oldest first
+    base, extension = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(base)}.[0-9][0-9][0-9]{extension}"))
+
+
+def read_cycle_log(path):
+    # rows of one file as dicts of COLUMNS plus message; a block cut short by a crash is skipped
+    if not path.endswith(".cyc"):
+        with open(path, newline="") as log_file:
+            yield from csv.DictReader(log_file)
+        return
+    with open(path, "rb") as log_file:
+        data = log_file.read()
+    position = 0
+    while position + BLOCK.size <= len(data):
+        magic, count = BLOCK.unpack_from(data, position)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a cycle log block at byte {position}")
+        position += BLOCK.size
+        columns = []
+        for typecode in TYPECODES:
+            column = array(typecode)
+            end = position + column.itemsize * count
+            if end > len(data):
+                return
+            column.frombytes(data[position:end])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+            position = end
+        if position + MESSAGES.size > len(data):
+            return
+        (length,) = MESSAGES.unpack_from(data, position)
+        position += MESSAGES.size
+        if position + length > len(data):
+            return
+        messages = data[position:position + length].decode().split("\0")
+        position += length
+        for index in range(count):
+            row = {name: column[index] for name, column in zip(COLUMNS, columns)}
+            row["kind"] = KINDS[row["kind"]]
+            row["message"] = messages[index]
+            yield row
@@ -1,77 +1,12 @@
 import tkinter as tk
-from tkinter import simpledialog, messagebox, Menu, Toplevel, StringVar, OptionMenu, BooleanVar, Checkbutton, Frame, LEFT, Label, Entry, Button
-from pymodbus.client.sync import ModbusTcpClient
-import threading
-import time
-
-# Common dialog class for settings
-class CustomDialog(simpledialog.Dialog):
-    def __init__(self, parent, title=None):
-        self.ip_address = ""
-        self.port = ""
-        self.coil_numbers = ""
-        super().__init__(parent, title)
-
-    def body(self, master):
-        tk.Label(master, text="IP Address:").grid(row=0)
-        tk.Label(master, text="Port:").grid(row=1)
-        tk.Label(master, text="Coil Numbers (comma separated):").grid(row=2)
-        
-        self.ip_entry = tk.Entry(master)
-        self.port_entry = tk.Entry(master)
-        self.coils_entry = tk.Entry(master)
-
-        self.ip_entry.insert(0, "10.3.200.10")
-        self.port_entry.insert(0, "502")
-        self.coils_entry.insert(0, "8192,8193,8194,8195")
-
-        self.ip_entry.bind("<FocusIn>", self.clear_ip_placeholder)
-        self.port_entry.bind("<FocusIn>", self.clear_port_placeholder)
-        self.coils_entry.bind("<FocusIn>", self.clear_coils_placeholder)
-
-        self.ip_entry.grid(row=0, column=1)
-        self.port_entry.grid(row=1, column=1)
-        self.coils_entry.grid(row=2, column=1)
-
-        return self.ip_entry
-
-    def clear_ip_placeholder(self, event):
-        if self.ip_entry.get() == "Enter IP address":
-            self.ip_entry.delete(0, tk.END)
-
-    def clear_port_placeholder(self, event):
-        if self.port_entry.get() == "Enter port number":
-            self.port_entry.delete(0, tk.END)
-
-    def clear_coils_placeholder(self, event):
-        if self.coils_entry.get() == "8192,8193,8194,8195":
-            self.coils_entry.delete(0, tk.END)
-
-    def apply(self):
-        self.ip_address = self.ip_entry.get()
-        self.port = int(self.port_entry.get())
-        self.coil_numbers = list(map(int, self.coils_entry.get().split(',')))
+from tkinter import messagebox, Menu, Toplevel, StringVar, OptionMenu, BooleanVar, Checkbutton, Label, Entry, Button
+from pusher_gui import ChannelControls, ChannelList, ModbusAppBase, command_line_profile
 
 # Main application class
-class ModbusApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Modbus Coil Control")
-        
-        dialog = CustomDialog(self.root, title="Modbus Settings")
-        self.ip_address = dialog.ip_address
-        self.port = dialog.port
-        self.coil_numbers = dialog.coil_numbers
-        
-        self.modbus_client = ModbusTcpClient(self.ip_address, self.port)
-        if not self.modbus_client.connect():
-            messagebox.showerror("Connection Error", "Failed to connect to Modbus server")
-            self.root.destroy()
-            return
-        
-        self.manual_control_running = False
-        self.auto_control_running = False
-        self.buttons = []
+class ModbusApp(ChannelControls, ModbusAppBase):
+    on_color = "green"
+
+    def create_interface(self):
         self.create_widgets()
         self.create_buttons()
         self.create_menu()
@@ -83,7 +18,8 @@ class ModbusApp:
         control_menu.add_command(label="Manual Control", command=self.manual_control)
         control_menu.add_command(label="Automatic Control", command=self.open_automatic_control)
         control_menu.add_separator()
-        control_menu.add_command(label="Exit", command=self.root.quit)
+        # through on_closing, so pending holds and the runner put their coils back first
+        control_menu.add_command(label="Exit", command=self.on_closing)
         menubar.add_cascade(label="Control", menu=control_menu)
 
         help_menu = Menu(menubar, tearoff=0)
@@ -110,6 +46,10 @@ class ModbusApp:
         self.stop_button.pack(pady=10)
 
     def create_buttons(self):
+        if self.use_coil_grid():
+            self.create_coil_grid()
+            return
+
         canvas = tk.Canvas(self.root, width=500, height=500)
         canvas.pack(pady=20)
 
@@ -121,11 +61,9 @@ class ModbusApp:
             btn = canvas.create_oval(x, y, x+button_size, y+button_size, fill="#F70D1A", outline="black")
             canvas.create_text(x + button_size/2, y + button_size/2 - 20, text=f"Button {i+1}", fill="black")
             canvas.create_text(x + button_size/2, y + button_size/2 + 20, text=f"Coil {coil}", fill="black")
-            self.buttons.append((btn, coil, canvas))
+            self.register_button(btn, coil, canvas)
             canvas.tag_bind(btn, "<Button-1>", lambda event, c=coil, b=btn: self.toggle_coil(c, b))
 
-        self.update_button_colors()
-
     def toggle_coil(self, coil, btn):
         try:
             duration = float(self.duration_entry.get())
@@ -133,47 +71,16 @@ class ModbusApp:
             messagebox.showerror("Invalid input", "Please enter a valid duration in seconds.")
             return
         
-        self.manual_control_running = True
         self.stop_button.config(state=tk.NORMAL)
-        thread = threading.Thread(target=self.toggle_coil_thread, args=(coil, btn, duration))
-        thread.start()
+        self.press_scheduler.press(coil, duration)
 
-    def toggle_coil_thread(self, coil, btn, duration):
-        try:
-            current_state = self.modbus_client.read_coils(coil, 1).bits[0]
-            self.modbus_client.write_coil(coil, not current_state)
-            self.update_button_color(btn, not current_state)
-            start_time = time.time()
-            while time.time() - start_time < duration:
-                if not self.manual_control_running:
-                    self.modbus_client.write_coil(coil, current_state)
-                    self.update_button_color(btn, current_state)
-                    return
-                time.sleep(0.1)
-            self.modbus_client.write_coil(coil, current_state)
-            self.update_button_color(btn, current_state)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event[0] == "done" and not self.press_scheduler.holds:
             self.stop_button.config(state=tk.DISABLED)
-            self.manual_control_running = False
-
-    def update_button_colors(self):
-        for btn, coil, canvas in self.buttons:
-            try:
-                current_state = self.modbus_client.read_coils(coil, 1).bits[0]
-                self.update_button_color(btn, current_state)
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-    
-    def update_button_color(self, btn, state):
-        color = "green" if state else "#F70D1A"
-        for canvas, item in [(canvas, item) for item, coil, canvas in self.buttons if item == btn]:
-            canvas.itemconfig(item, fill=color)
 
     def manual_control(self):
-        self.manual_control_running = False
-        self.auto_control_running = False
+        self.stop_all()
 
     def open_automatic_control(self):
         self.auto_control_window = Toplevel(self.root)
@@ -193,49 +100,38 @@ class ModbusApp:
         button_menu = OptionMenu(self.auto_control_window, self.button_var, *[f"Button {i+1}" for i in range(len(self.coil_numbers))])
         button_menu.grid(row=2, column=1)
 
+        Label(self.auto_control_window, text="Phase (seconds):").grid(row=3, column=0)
+        self.phase_entry = Entry(self.auto_control_window)
+        self.phase_entry.insert(0, "0")
+        self.phase_entry.grid(row=3, column=1)
+
         self.loop_var = BooleanVar()
-        Checkbutton(self.auto_control_window, text="Loop", variable=self.loop_var).grid(row=3, columnspan=2)
+        Checkbutton(self.auto_control_window, text="Loop", variable=self.loop_var).grid(row=4, columnspan=2)
+
+        Button(self.auto_control_window, text="Add Channel", command=self.add_channel).grid(row=5, columnspan=2)
+        self.channel_list = ChannelList(self.auto_control_window, self.coil_numbers)
+        self.channel_list.grid(row=6, columnspan=2)
 
-        Button(self.auto_control_window, text="Start", command=self.start_automatic_control).grid(row=4, columnspan=2)
-        self.stop_button = Button(self.auto_control_window, text="Stop", command=self.stop_automatic_control)
-        self.stop_button.grid(row=5, columnspan=2)
+        Button(self.auto_control_window, text="Start", command=self.start_automatic_control).grid(row=7, columnspan=2)
+        # its own name: self.stop_button stays the main window's, which outlives this one
+        self.auto_stop_button = Button(self.auto_control_window, text="Stop", command=self.stop_automatic_control)
+        self.auto_stop_button.grid(row=8, columnspan=2)
+        Button(self.auto_control_window, text="Dry Run", command=self.dry_run_automatic_control).grid(row=9, columnspan=2)
     
     def start_automatic_control(self):
-        try:
-            press_duration = float(self.press_duration_entry.get())
-            wait_duration = float(self.wait_duration_entry.get())
-        except ValueError:
-            messagebox.showerror("Invalid input", "Please enter valid durations in seconds.")
-            return
-        
-        button_index = int(self.button_var.get().split()[-1]) - 1
-        coil = self.coil_numbers[button_index]
-        self.auto_control_running = True
-        self.stop_button.config(state=tk.NORMAL)
-
-        def auto_control():
-            while self.auto_control_running:
-                self.toggle_coil_thread(coil, self.buttons[button_index][0], press_duration)
-                time.sleep(wait_duration)
-                if not self.loop_var.get():
-                    break
-
-        self.auto_control_thread = threading.Thread(target=auto_control)
-        self.auto_control_thread.start()
+        if super().start_automatic_control():
+            self.auto_stop_button.config(state=tk.NORMAL)
 
     def stop_automatic_control(self):
-        self.auto_control_running = False
-        self.stop_button.config(state=tk.DISABLED)
+        self.stop_all()
+        self.auto_stop_button.config(state=tk.DISABLED)
 
     def stop_all_control(self):
-        self.manual_control_running = False
-        self.auto_control_running = False
-        for btn, coil, canvas in self.buttons:
-            self.modbus_client.write_coil(coil, False)
-            self.update_button_color(btn, False)
+        self.stop_all()
         self.stop_button.config(state=tk.DISABLED)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = ModbusApp(root)
+    app = ModbusApp(root, command_line_profile())
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
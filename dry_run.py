@@ -0,0 +1,181 @@
+import time
+from contextlib import contextmanager
+
+# Dry runs stop at this virtual time unless told otherwise (seconds): a day of a looping sequence
+DEFAULT_HORIZON = 24 * 3600.0
+# overlaps listed in the report; the rest are only counted
+MAX_LISTED_OVERLAPS = 10
+
+
+# Virtual time for a press_engine runner (runner.clock). It is also the DeadlineTimer's stop
+# object: wait() moves the clock to the deadline at once instead of sleeping, and reports a
+# stop once the deadline reaches until, so an edge due exactly at the horizon is not run.
+class VirtualClock:
+    def __init__(self, until=None):
+        self.time = 0.0
+        self.until = until
+        self.on_expire = None
+
+    def now(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+    def wait(self, timeout):
+        # same contract as threading.Event.wait: True means the wait was stopped
+        if self.until is not None and self.time + timeout >= self.until:
+            self.time = max(self.time, self.until)
+            if self.on_expire:
+                self.on_expire()
+            return True
+        self.time += timeout
+        return False
+
+
+class ModelResult:
+    def __init__(self, bits=None):
+        self.bits = bits
+
+    def isError(self):
+        return False
+
+
+# In-memory coils standing in for modbus_connection.ModbusConnection. Every change of a coil
+# is logged as (virtual time, coil, state); each transaction may cost some simulated latency.
+class CoilModel:
+    def __init__(self, clock, latency=0.0, states=None):
+        self.clock = clock
+        self.latency = latency
+        self.device = "dry-run"
+        self.states = dict(states or {})
+        self.edges = []
+        self.transactions = 0
+
+    @contextmanager
+    def priority(self, level):
+        yield
+
+    def transact(self):
+        self.transactions += 1
+        if self.latency:
+            self.clock.advance(self.latency)
+
+    def set(self, coil, state):
+        state = bool(state)
+        if self.states.get(coil, False) != state:
+            self.states[coil] = state
+            self.edges.append((self.clock.time, coil, state))
+
+    def read_coils(self, address, count=1, **kwargs):
+        self.transact()
+        return ModelResult([self.states.get(address + offset, False) for offset in range(count)])
+
+    def write_coil(self, address, value, **kwargs):
+        self.transact()
+        self.set(address, value)
+        return ModelResult()
+
+    def write_coils(self, address, values, **kwargs):
+        self.transact()
+        for offset, value in enumerate(values):
+            self.set(address + offset, value)
+        return ModelResult()
+
+
+class DryRunEvents:
+    def __init__(self):
+        self.errors = []
+
+    def put(self, event):
+        if event[0] == "error":
+            self.errors.append(event[1])
+
+
+class DryRunReport:
+    def __init__(self, model, runtime, coils, timer, errors, wall_time):
+        self.edges = model.edges
+        self.transactions = model.transactions
+        self.runtime = runtime
+        self.timer = timer
+        self.errors = errors
+        self.wall_time = wall_time
+        self.on_time = dict.fromkeys(coils, 0.0)
+        # (start, end, coils on) for every stretch with more than one coil on
+        self.overlaps = []
+        on = {}
+        previous = 0.0
+        for when, coil, state in self.edges:
+            if len(on) > 1 and when > previous:
+                self.add_overlap(previous, when, on)
+            previous = when
+            if state:
+                on.setdefault(coil, when)
+            elif coil in on:
+                self.on_time[coil] = self.on_time.get(coil, 0.0) + when - on.pop(coil)
+        if len(on) > 1 and runtime > previous:
+            self.add_overlap(previous, runtime, on)
+        for coil, since in on.items():
+            self.on_time[coil] = self.on_time.get(coil, 0.0) + runtime - since
+        self.left_on = sorted(on)
+
+    def add_overlap(self, start, end, on):
+        if self.overlaps and self.overlaps[-1][1] == start:
+            first, _, coils = self.overlaps[-1]
+            self.overlaps[-1] = (first, end, coils | set(on))
+        else:
+            self.overlaps.append((start, end, set(on)))
+
+    def timeline_lines(self):
+        return [f"{when:12.3f} s  coil {coil} {'ON' if state else 'OFF'}" for when, coil, state in self.edges]
+
+    def summary_lines(self):
+        lines = [f"Dry run: {format_duration(self.runtime)} of virtual time, {len(self.edges)} edges, "
+                 f"{self.transactions} transactions, checked in {self.wall_time * 1000:.0f} ms"]
+        if self.timer is not None:
+            lines.append(self.timer.summary())
+        for coil, seconds in sorted(self.on_time.items()):
+            duty = seconds / self.runtime * 100 if self.runtime else 0.0
+            lines.append(f"coil {coil}: on {format_duration(seconds)} ({duty:.1f}%)")
+        if self.overlaps:
+            total = sum(end - start for start, end, _ in self.overlaps)
+            lines.append(f"{len(self.overlaps)} overlaps, {format_duration(total)} with several coils on:")
+            for start, end, coils in self.overlaps[:MAX_LISTED_OVERLAPS]:
+                lines.append(f"  {start:.3f}-{end:.3f} s: coils {', '.join(map(str, sorted(coils)))}")
+            if len(self.overlaps) > MAX_LISTED_OVERLAPS:
+                lines.append(f"  ... {len(self.overlaps) - MAX_LISTED_OVERLAPS} more")
+        else:
+            lines.append("No overlaps")
+        if self.left_on:
+            lines.append(f"Coils still on at the end: {self.left_on}")
+        lines.extend(f"error: {error}" for error in self.errors)
+        return lines
+
+
+def format_duration(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours)}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def dry_run(make_runner, coils, until=DEFAULT_HORIZON, latency=0.0, log=None):
+    # make_runner(connection, events) as for multi_device.FanOut; the runner sees the model
+    # as its connection and never waits, so hours of sequence take a fraction of a second.
+    # An optional cycle_log.CycleLog gets the run's edges (time is the wall clock, offset virtual).
+    clock = VirtualClock(until)
+    model = CoilModel(clock, latency)
+    events = DryRunEvents()
+    runner = make_runner(model, events)
+    runner.clock = clock
+    runner.log = log
+    if log is not None:
+        # virtual time has no deadlines to protect, so wait for the writer rather than drop rows
+        log.block = True
+    clock.on_expire = runner.stop
+    started = time.perf_counter()
+    runner.run()
+    # a finished run still lasts to the end of its last pass, trailing wait included
+    runtime = clock.time
+    if runner.duration is not None:
+        runtime = max(runtime, runner.duration if until is None else min(runner.duration, until))
+    return DryRunReport(model, runtime, coils, runner.timer, events.errors, time.perf_counter() - started)
@@ -0,0 +1,181 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from coil_batch import read_coil_states, release_coils
+from metrics import LatencyHistogram
+from modbus_connection import ModbusConnection
+from modbus_sim import SimulatedPLC
+from profiles import DEFAULTS
+from transaction_scheduler import EMERGENCY
+
+DEFAULT_CONCURRENCY = 4
+# requests allowed to wait for a free worker, per worker, before new ones are dropped
+MAX_BACKLOG = 50
+
+
+class StepResult:
+    def __init__(self, rate):
+        self.rate = rate
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.backlog = 0
+        self.elapsed = 0.0
+        self.latency = LatencyHistogram()
+
+    @property
+    def throughput(self):
+        return (self.completed - self.errors) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        return self.errors / self.completed if self.completed else 0.0
+
+    @property
+    def drop_rate(self):
+        return self.dropped / self.sent if self.sent else 0.0
+
+
+# Open-loop load: request i is due at start + i / rate whatever the device is doing, and its
+# latency is measured from that due time. A device that falls behind therefore shows up as
+# growing latency, not as a quietly lower request rate like in a press-then-wait loop.
+class LoadGenerator:
+    def __init__(self, connection, coils, write_fraction=0.5, concurrency=DEFAULT_CONCURRENCY):
+        self.connection = connection
+        self.coils = list(coils)
+        self.write_fraction = write_fraction
+        self.concurrency = concurrency
+        self.states = dict.fromkeys(self.coils, False)
+        self.lock = threading.Lock()
+
+    def is_write(self, index):
+        # spreads the writes evenly over the schedule: exactly write_fraction of any long run
+        return int((index + 1) * self.write_fraction) > int(index * self.write_fraction)
+
+    def write(self, index):
+        coil = self.coils[index % len(self.coils)]
+        with self.lock:
+            state = self.states[coil] = not self.states[coil]
+        return not self.connection.write_coil(coil, state).isError()
+
+    def read(self, index):
+        read_coil_states(self.connection, self.coils)
+        return True
+
+    def request(self, result, index, due):
+        try:
+            ok = self.write(index) if self.is_write(index) else self.read(index)
+        except Exception:
+            ok = False
+        result.latency.record(time.perf_counter_ns() - due)
+        with self.lock:
+            result.completed += 1
+            result.errors += not ok
+            result.backlog -= 1
+
+    def run_step(self, rate, duration):
+        result = StepResult(rate)
+        total = max(1, int(rate * duration))
+        interval_ns = int(1e9 / rate)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="load") as executor:
+            started = time.perf_counter_ns()
+            for index in range(total):
+                due = started + index * interval_ns
+                delay = due - time.perf_counter_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+                result.sent += 1
+                with self.lock:
+                    if result.backlog >= self.concurrency * MAX_BACKLOG:
+                        result.dropped += 1
+                        continue
+                    result.backlog += 1
+                executor.submit(self.request, result, index, due)
+        result.elapsed = (time.perf_counter_ns() - started) / 1e9
+        return result
+
+    def sweep(self, rates, duration, max_latency=None, max_error_rate=None, report=None):
+        # stops after the first step whose p99, error rate or drop rate is over the limit
+        results = []
+        for rate in rates:
+            result = self.run_step(rate, duration)
+            results.append(result)
+            if report:
+                report(result)
+            if max_latency is not None and result.latency.percentile(0.99) > max_latency:
+                break
+            if max_error_rate is not None and max(result.error_rate, result.drop_rate) > max_error_rate:
+                break
+        return results
+
+
+def rate_steps(start, stop, factor):
+    rates = []
+    rate = start
+    while rate <= stop * 1.0001:
+        rates.append(rate)
+        rate *= factor
+    return rates
+
+
+def print_header():
+    print(f"{'target/s':>10}{'achieved/s':>12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"{'errors':>9}{'dropped':>9}", flush=True)
+
+
+def print_step(result):
+    p50, p90, p99, p100 = (result.latency.percentile(fraction) * 1000 for fraction in (0.5, 0.9, 0.99, 1.0))
+    print(f"{result.rate:>10.0f}{result.throughput:>12.1f}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{p100:>10.2f}"
+          f"{result.error_rate * 100:>8.1f}%{result.drop_rate * 100:>8.1f}%", flush=True)
+
+
+def run(host, port, coils, args):
+    # one socket per worker, so concurrency is what is actually in flight at the device
+    connection = ModbusConnection(host, port, pool_size=args.concurrency)
+    if not connection.connect():
+        raise SystemExit(f"Failed to connect to Modbus server {host}:{port}")
+    generator = LoadGenerator(connection, coils, args.writes, args.concurrency)
+    print(f"{host}:{port}  {len(coils)} coils, {args.writes * 100:.0f}% writes, "
+          f"{args.concurrency} in flight, {args.duration:g} s per step")
+    print_header()
+    try:
+        return generator.sweep(rate_steps(args.start, args.max_rate, args.factor), args.duration,
+                               args.max_latency, args.max_errors, print_step)
+    finally:
+        # writes leave coils toggled; always end with everything off
+        with connection.priority(EMERGENCY):
+            release_coils(connection, coils)
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep an open-loop coil read/write load to find a PLC's throughput limit")
+    parser.add_argument("--host", default=None, help="load a real device instead of the local simulator (its coils WILL toggle)")
+    parser.add_argument("--port", type=int, default=502)
+    parser.add_argument("--coils", type=lambda text: list(map(int, text.split(','))), default=DEFAULTS["coils"],
+                        help="coils written in turn; reads fetch all of them in batched requests")
+    parser.add_argument("--writes", type=float, default=0.5, help="fraction of requests that are coil writes (0-1)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="requests in flight at most")
+    parser.add_argument("--start", type=float, default=50, help="first target rate (requests per second)")
+    parser.add_argument("--factor", type=float, default=1.5, help="rate multiplier between steps")
+    parser.add_argument("--max-rate", type=float, default=5000)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per step")
+    parser.add_argument("--max-latency", type=float, default=1.0, help="stop after a step with p99 above this (seconds)")
+    parser.add_argument("--max-errors", type=float, default=0.05,
+                        help="stop after a step with more errors or dropped requests than this fraction")
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated per-request latency (seconds)")
+    args = parser.parse_args(argv)
+    if not 0 <= args.writes <= 1 or args.concurrency < 1 or args.start <= 0 or args.factor <= 1:
+        parser.error("need 0 <= --writes <= 1, --concurrency >= 1, --start > 0 and --factor > 1")
+
+    if args.host:
+        run(args.host, args.port, args.coils, args)
+    else:
+        with SimulatedPLC(latency=args.latency) as plc:
+            run(plc.host, plc.port, args.coils, args)
+
+
+if __name__ == "__main__":
+    main()
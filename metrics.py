@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import deque
+
+# HDR-style histogram over integer nanoseconds: 16 linear sub-buckets per power of two,
+# so any recorded value is known to within 1/16 (6%) from 1 ns up to MAX_NS.
+SUB_BUCKETS = 16
+MAX_NS = 1 << 36  # ~69 s; anything slower lands in the last bucket
+BUCKETS = (MAX_NS.bit_length() - 4) * SUB_BUCKETS
+# upper bounds (seconds) of the buckets exported to Prometheus
+EXPORT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# seconds between two passes of the registry thread that sorts recorded samples into buckets
+FOLD_INTERVAL = 1.0
+# metrics_server.MetricsServer listens here unless told otherwise
+DEFAULT_METRICS_PORT = 9108
+
+
+def bucket_index(ns):
+    shift = max(ns.bit_length() - 5, 0)
+    return min((shift << 4) + (ns >> shift), BUCKETS - 1)
+
+
+def bucket_upper_ns(index):
+    shift = max((index >> 4) - 1, 0)
+    return ((index - (shift << 4)) << shift) + (1 << shift)
+
+
+# record() sits on the Modbus call path, so it only appends to a deque (thread-safe, no lock);
+# the samples are sorted into buckets by the registry thread or whenever the histogram is read.
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.pending = deque()
+        self.lock = threading.Lock()
+
+    def record(self, ns):
+        self.pending.append(ns)
+
+    def fold(self):
+        pending = self.pending
+        counts = self.counts
+        with self.lock:
+            for _ in range(len(pending)):
+                ns = pending.popleft()
+                if ns < 0:
+                    ns = 0
+                counts[bucket_index(ns)] += 1
+                self.count += 1
+                self.total_ns += ns
+
+    def snapshot(self):
+        self.fold()
+        with self.lock:
+            return list(self.counts), self.count, self.total_ns
+
+    def percentile(self, fraction):
+        counts, count, _ = self.snapshot()
+        if not count:
+            return 0.0
+        rank = max(1, round(fraction * count))
+        seen = 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= rank:
+                return bucket_upper_ns(index) / 1e9
+        return MAX_NS / 1e9
+
+    def cumulative(self, bounds=EXPORT_BOUNDS):
+        # [(le seconds, observations <= le)], bucket edges rounded up to the export bound
+        counts, count, total_ns = self.snapshot()
+        result = []
+        seen = index = 0
+        for bound in bounds:
+            limit = bound * 1e9
+            while index < BUCKETS and bucket_upper_ns(index) <= limit:
+                seen += counts[index]
+                index += 1
+            result.append((bound, seen))
+        return result, count, total_ns / 1e9
+
+
+class TransactionStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+
+    def record(self, ns, ok):
+        self.latency.record(ns)
+        if not ok:
+            with self.latency.lock:
+                self.errors += 1
+
+
+# Process-wide store of transaction and edge-lateness statistics, keyed by device ("host:port").
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.lateness = {}
+        self.thread = None
+
+    def transaction(self, device, function):
+        with self.lock:
+            self.start_folding()
+            return self.transactions.setdefault((device, function), TransactionStats())
+
+    def edge_lateness(self, device):
+        with self.lock:
+            self.start_folding()
+            return self.lateness.setdefault(device, LatencyHistogram())
+
+    def start_folding(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.fold_forever, daemon=True)
+            self.thread.start()
+
+    def fold_forever(self):
+        while True:
+            time.sleep(FOLD_INTERVAL)
+            transactions, lateness = self.items()
+            for _, stats in transactions:
+                stats.latency.fold()
+            for _, histogram in lateness:
+                histogram.fold()
+
+    def items(self):
+        with self.lock:
+            return sorted(self.transactions.items()), sorted(self.lateness.items())
+
+    def prometheus_text(self):
+        transactions, lateness = self.items()
+        lines = ["# HELP modbus_transaction_seconds Modbus transaction latency, retries included",
+                 "# TYPE modbus_transaction_seconds histogram"]
+        for (device, function), stats in transactions:
+            lines += histogram_lines("modbus_transaction_seconds", stats.latency,
+                                     f'device="{device}",function="{function}"')
+        lines += ["# HELP modbus_transaction_errors_total Modbus transactions that raised or returned an error",
+                  "# TYPE modbus_transaction_errors_total counter"]
+        for (device, function), stats in transactions:
+            lines.append(f'modbus_transaction_errors_total{{device="{device}",function="{function}"}} {stats.errors}')
+        lines += ["# HELP modbus_edge_lateness_seconds Delay between a sequence edge's deadline and its write",
+                  "# TYPE modbus_edge_lateness_seconds histogram"]
+        for device, histogram in lateness:
+            lines += histogram_lines("modbus_edge_lateness_seconds", histogram, f'device="{device}"')
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self, device=None):
+        transactions, lateness = self.items()
+        lines = []
+        for (stats_device, function), stats in transactions:
+            if device in (None, stats_device):
+                lines.append(f"{summary_line(function, stats.latency)}  err {stats.errors}")
+        for stats_device, histogram in lateness:
+            if device in (None, stats_device):
+                lines.append(summary_line("edge late", histogram))
+        return lines
+
+
+def summary_line(label, histogram):
+    return (f"{label:<12} n={histogram.snapshot()[1]:<7} p50 {histogram.percentile(0.5) * 1000:6.1f} ms  "
+            f"p99 {histogram.percentile(0.99) * 1000:6.1f} ms")
+
+
+def histogram_lines(name, histogram, labels):
+    buckets, count, total = histogram.cumulative()
+    lines = [f'{name}_bucket{{{labels},le="{bound:g}"}} {seen}' for bound, seen in buckets]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{labels}}} {total:.9f}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+    return lines
+
+
+registry = MetricsRegistry()
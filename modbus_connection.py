@@ -0,0 +1,160 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pymodbus.client.sync import ModbusTcpClient
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+import metrics
+from transaction_scheduler import PRESS, TransactionScheduler
+
+# Most PLCs only accept a handful of TCP connections, so keep the pool small.
+# Sockets are opened lazily: a second one only appears when two transactions overlap.
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 3
+RECONNECT_DELAY = 0.1
+MAX_RECONNECT_DELAY = 5.0
+# TCP keepalive on every socket, so the OS notices a dead idle link after about
+# KEEPALIVE_IDLE + KEEPALIVE_INTERVAL * KEEPALIVE_COUNT seconds instead of hours (seconds)
+KEEPALIVE_IDLE = 2
+KEEPALIVE_INTERVAL = 1
+KEEPALIVE_COUNT = 3
+# The device could not be reached, as opposed to a device that answered with an exception
+LINK_ERRORS = (ConnectionException, OSError)
+
+
+def enable_keepalive(sock):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    idle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+    if idle is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, idle, KEEPALIVE_IDLE)
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL)
+        if hasattr(socket, "TCP_KEEPCNT"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_COUNT)
+    elif hasattr(socket, "SIO_KEEPALIVE_VALS"):
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, KEEPALIVE_IDLE * 1000, KEEPALIVE_INTERVAL * 1000))
+
+
+class ModbusConnection:
+    def __init__(self, host, port=502, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, registry=None,
+                 rate=None, burst=None):
+        self.host = host
+        self.port = port
+        self.device = f"{host}:{port}"
+        self.metrics = registry or metrics.registry
+        self.stats = {}
+        self.clients = [ModbusTcpClient(host, port, timeout=timeout) for _ in range(pool_size)]
+        # rate: transactions per second for this device (None: unlimited)
+        self.scheduler = TransactionScheduler(self.clients, rate, burst)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.reconnect_delay = RECONNECT_DELAY
+        self.next_connect_time = 0.0
+        # time.monotonic() of the last transaction the device answered (read by connection_watchdog)
+        self.last_response = 0.0
+
+    def connect(self):
+        client = self.scheduler.checkout(self.current_priority())
+        try:
+            return self.open(client)
+        finally:
+            self.scheduler.checkin(client)
+
+    @contextmanager
+    def priority(self, level):
+        # transactions made by this thread inside the block are scheduled as transaction_scheduler.<level>
+        previous = self.current_priority()
+        self.local.priority = level
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def current_priority(self):
+        return getattr(self.local, "priority", PRESS)
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+    def open(self, client):
+        if client.is_socket_open():
+            return True
+        with self.lock:
+            if time.monotonic() < self.next_connect_time:
+                return False
+        connected = client.connect()
+        if connected:
+            try:
+                enable_keepalive(client.socket)
+            except OSError:
+                pass
+        with self.lock:
+            if connected:
+                self.reconnect_delay = RECONNECT_DELAY
+                self.next_connect_time = 0.0
+            else:
+                self.next_connect_time = time.monotonic() + self.reconnect_delay
+                self.reconnect_delay = min(self.reconnect_delay * 2, MAX_RECONNECT_DELAY)
+        return connected
+
+    def execute(self, method, *args, **kwargs):
+        stats = self.stats.get(method)
+        if stats is None:
+            stats = self.stats[method] = self.metrics.transaction(self.device, method)
+        ok = False
+        started = time.perf_counter_ns()
+        try:
+            result = self.transact(method, *args, **kwargs)
+            self.last_response = time.monotonic()
+            ok = not result.isError()
+            return result
+        finally:
+            stats.record(time.perf_counter_ns() - started, ok)
+
+    def transact(self, method, *args, **kwargs):
+        client = self.scheduler.checkout(self.current_priority())
+        try:
+            # Every function code we use is idempotent, so one retry on a fresh socket is safe
+            for attempt in range(2):
+                if not self.open(client):
+                    raise ConnectionException(f"{self.host}:{self.port} (retrying in {self.reconnect_delay:.1f}s)")
+                try:
+                    result = getattr(client, method)(*args, **kwargs)
+                except (ConnectionException, OSError):
+                    client.close()
+                    if attempt:
+                        raise
+                    continue
+                if isinstance(result, ModbusIOException):
+                    # no usable response even on a fresh socket: the link is down, not the request
+                    client.close()
+                    if attempt:
+                        raise ConnectionException(f"{self.device}: {result}")
+                    continue
+                return result
+        finally:
+            self.scheduler.checkin(client)
+
+    def probe(self, address=0):
+        # True if the device answers at all, even with a Modbus exception
+        try:
+            self.read_coils(address, 1)
+        except LINK_ERRORS:
+            return False
+        return True
+
+    def read_coils(self, address, count=1, **kwargs):
+        return self.execute("read_coils", address, count, **kwargs)
+
+    def write_coil(self, address, value, **kwargs):
+        return self.execute("write_coil", address, value, **kwargs)
+
+    def write_coils(self, address, values, **kwargs):
+        return self.execute("write_coils", address, values, **kwargs)
+
+    def read_holding_registers(self, address, count=1, **kwargs):
+        return self.execute("read_holding_registers", address, count, **kwargs)
+
+    def read_input_registers(self, address, count=1, **kwargs):
+        return self.execute("read_input_registers", address, count, **kwargs)
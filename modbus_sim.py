@@ -0,0 +1,110 @@
+import argparse
+import threading
+import time
+from pymodbus.datastore import (ModbusSequentialDataBlock, ModbusSparseDataBlock,
+                                ModbusServerContext, ModbusSlaveContext)
+from pymodbus.server.sync import ModbusConnectedRequestHandler, ModbusTcpServer
+
+
+class LatencyRequestHandler(ModbusConnectedRequestHandler):
+    def execute(self, request):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        super().execute(request)
+
+
+class SimulatorServer(ModbusTcpServer):
+    daemon_threads = True
+    block_on_close = False
+
+
+# In-process stand-in for a PLC. coils is either a count (addresses 0..count-1)
+# or an iterable of addresses; reads outside a sparse map fail like on a real device.
+# Holding and input registers 0..registers-1 start at zero.
+class SimulatedPLC:
+    def __init__(self, coils=65536, latency=0.0, host="127.0.0.1", port=0, registers=65536):
+        if isinstance(coils, int):
+            coil_block = ModbusSequentialDataBlock(0, [False] * coils)
+        else:
+            coil_block = ModbusSparseDataBlock(dict.fromkeys(coils, False))
+        self.store = ModbusSlaveContext(co=coil_block, hr=ModbusSequentialDataBlock(0, [0] * registers),
+                                        ir=ModbusSequentialDataBlock(0, [0] * registers), zero_mode=True)
+        self.server = SimulatorServer(ModbusServerContext(slaves=self.store, single=True),
+                                      address=(host, port), handler=LatencyRequestHandler,
+                                      allow_reuse_address=True)
+        self.server.latency = latency
+        self.server.requests = 0
+        self.server.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def latency(self):
+        return self.server.latency
+
+    @latency.setter
+    def latency(self, value):
+        self.server.latency = value
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def coil_states(self, coils):
+        return {coil: bool(self.store.getValues(1, coil, 1)[0]) for coil in coils}
+
+    def set_coils(self, states):
+        for coil, state in states.items():
+            self.store.setValues(5, coil, [bool(state)])
+
+    def registers(self, table, address, count=1):
+        # table: "hr" (holding) or "ir" (input)
+        return self.store.getValues(3 if table == "hr" else 4, address, count)
+
+    def set_registers(self, table, address, values):
+        self.store.setValues(3 if table == "hr" else 4, address, list(values))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Modbus TCP PLC simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--coils", type=int, default=65536, help="number of coils, starting at address 0")
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial delay per request (seconds)")
+    args = parser.parse_args(argv)
+
+    with SimulatedPLC(args.coils, args.latency, args.host, args.port) as plc:
+        print(f"Simulating {args.coils} coils on {plc.host}:{plc.port} with {args.latency * 1000:.1f} ms latency")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from coil_batch import release_coils
+from modbus_connection import ModbusConnection
+from transaction_scheduler import EMERGENCY
+
+# Sequence workers spend nearly all their time sleeping until the next edge,
+# so one thread per device is cheap; the cap only guards against typos in huge lists.
+MAX_WORKERS = 64
+
+
+def parse_devices(text, default_port=502):
+    devices = []
+    for item in text.split(','):
+        host, _, port = item.strip().partition(':')
+        devices.append((host, int(port) if port else default_port))
+    return devices
+
+
+class DeviceResult:
+    def __init__(self, device):
+        self.device = device
+        self.elapsed = 0.0
+        self.timer = None
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class DeviceEvents:
+    def __init__(self, result, events=None):
+        self.result = result
+        self.events = events
+
+    def put(self, event):
+        if event[0] == "error":
+            self.result.errors.append(event[1])
+        if self.events is not None:
+            self.events.put(event)
+
+
+# Runs one sequence definition against many devices at once, each on its own connection.
+# make_runner(connection, events) builds the press_engine runner for one device;
+# coils are released on any device that fails or is stopped.
+class FanOut:
+    def __init__(self, devices, make_runner, coils, max_workers=MAX_WORKERS, events_for=None, rate=None):
+        self.devices = list(devices)
+        self.rate = rate
+        self.make_runner = make_runner
+        self.coils = list(coils)
+        self.max_workers = max(1, min(max_workers, len(self.devices)))
+        self.events_for = events_for
+        self.runners = {}
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        for runner in list(self.runners.values()):
+            runner.stop()
+
+    def run(self):
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = [executor.submit(self.run_device, device) for device in self.devices]
+        try:
+            return [future.result() for future in futures]
+        except KeyboardInterrupt:
+            self.stop()
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown()
+
+    def run_device(self, device):
+        host, port = device
+        result = DeviceResult(device)
+        if not self.running:
+            result.errors.append("stopped before start")
+            return result
+        started = time.monotonic()
+        connection = ModbusConnection(host, port, pool_size=1, rate=self.rate)
+        try:
+            if not connection.connect():
+                result.errors.append(f"Failed to connect to Modbus server {host}:{port}")
+                return result
+            events = self.events_for(device) if self.events_for else None
+            runner = self.runners[device] = self.make_runner(connection, DeviceEvents(result, events))
+            if self.running:
+                runner.run()
+            result.timer = runner.timer
+            if result.errors or not self.running:
+                try:
+                    with connection.priority(EMERGENCY):
+                        release_coils(connection, self.coils)
+                except Exception as e:
+                    result.errors.append(f"release failed: {e}")
+        finally:
+            result.elapsed = time.monotonic() - started
+            connection.close()
+        return result
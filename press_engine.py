@@ -0,0 +1,354 @@
+import heapq
+import itertools
+import threading
+import time
+from coil_batch import plan_coil_writes, read_coil_states, write_coil_runs, write_coil_states
+from coil_cache import stale_message
+from modbus_connection import LINK_ERRORS, MAX_RECONNECT_DELAY, RECONNECT_DELAY
+from sequence_timeline import plan_step_writes
+from sequence_timing import DeadlineTimer
+from transaction_scheduler import EDGE
+
+
+# Base for the blocking engines: run() in the calling thread, or start() a daemon thread.
+# cycles=None repeats until stop(), which also cuts any wait short; the coils are left as they
+# are, so whoever stops a runner releases them, e.g. with release_held() once it has ended.
+# Events go to anything with a put() method:
+#   ("state", coil, state), ("error", message), ("finished",)
+# Writes are recorded in the optional coil_cache.VerifiedCoilCache so it stays fresh.
+# Setting clock to a dry_run.VirtualClock runs the same engine in virtual time, and setting
+# log to a cycle_log.CycleLog streams every edge and read-back to disk.
+# If the link drops mid-run, the runner waits for the device (see recover) and picks up at the
+# step it was on, posting ("link", False) and then ("resumed", outage seconds, released coils).
+class Runner:
+    def __init__(self, connection, cycles=None, events=None, cache=None):
+        self.connection = connection
+        self.cycles = cycles
+        self.events = events
+        self.cache = cache
+        self.running = True
+        self.stop_event = threading.Event()
+        self.clock = None
+        self.log = None
+        # seconds to wait for a lost device before giving up with an error (None: until stop())
+        self.max_outage = None
+        # {coil: rest state} for every coil this runner has switched away from rest and not yet back
+        self.held = {}
+        self.cycle = 0
+        self.timer = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def post(self, *event):
+        if self.events is not None:
+            self.events.put(event)
+
+    def run(self):
+        timer = self.timer = self.create_timer()
+        cycle = 0
+        try:
+            with self.connection.priority(EDGE):
+                while self.running and (self.cycles is None or cycle < self.cycles):
+                    self.cycle = cycle
+                    self.run_cycle(timer, cycle)
+                    cycle += 1
+        except Exception as e:
+            self.post("error", str(e))
+        finally:
+            self.running = False
+            self.post("finished")
+
+    def create_timer(self):
+        if self.clock is not None:
+            # waits return at once with the clock moved on; lateness is only the simulated latency
+            return DeadlineTimer(self.clock.now, stop=self.clock)
+        return DeadlineTimer(histogram=self.connection.metrics.edge_lateness(self.connection.device),
+                             stop=self.stop_event)
+
+    def run_cycle(self, timer, cycle):
+        raise NotImplementedError
+
+    @property
+    def pass_duration(self):
+        # seconds one cycle is planned to take, trailing wait included (None: open-ended)
+        return None
+
+    @property
+    def duration(self):
+        # planned length of the whole run (None: runs until stopped)
+        if self.cycles is None or self.pass_duration is None:
+            return None
+        return self.cycles * self.pass_duration
+
+    def release_held(self):
+        # puts every coil this runner left switched away from rest back at rest; returns them
+        release = dict(self.held)
+        if release:
+            write_coil_states(self.connection, release)
+            self.held.clear()
+            self.wrote(release)
+            for coil, state in release.items():
+                self.post("state", coil, state)
+        return release
+
+    def wrote(self, states):
+        if self.cache:
+            self.cache.wrote(states)
+
+    @staticmethod
+    def away_from_rest(states, rest=None):
+        # {coil: rest state} for the coils in states switched away from rest (default: all OFF)
+        rest = rest or {}
+        return {coil: rest.get(coil, False) for coil, state in states.items() if state != rest.get(coil, False)}
+
+    def recover(self, error, offset, states, probe_coil=None, rest=None):
+        # The link dropped at the step due at offset (None: no step due yet). Retries with backoff
+        # until the device answers, puts every held coil and any the step was switching away
+        # from rest back to its rest state, and moves the schedule so a late step runs now with
+        # its full duration ahead of it. False if stopped meanwhile; re-raises error once
+        # max_outage has passed.
+        lost = time.monotonic()
+        release = {**self.away_from_rest(states, rest), **self.held}
+        probe_coil = next(iter(states)) if probe_coil is None else probe_coil
+        self.post("link", False)
+        if self.log is not None:
+            self.log.error(f"link lost: {error}")
+        delay = RECONNECT_DELAY
+        while not self.reconnect(release, probe_coil):
+            if self.max_outage is not None and time.monotonic() - lost > self.max_outage:
+                raise error
+            if self.stop_event.wait(delay):
+                return False
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        self.held.clear()
+        self.wrote(release)
+        for coil, state in release.items():
+            self.post("state", coil, state)
+        if offset is not None:
+            self.timer.start = max(self.timer.start, self.timer.clock() - offset)
+        self.post("resumed", time.monotonic() - lost, sorted(release))
+        return self.running
+
+    def reconnect(self, release, probe_coil):
+        # one attempt: True once the device answered and the coils in release are back at rest
+        try:
+            if release:
+                write_coil_states(self.connection, release)
+                return True
+            return self.connection.probe(probe_coil)
+        except LINK_ERRORS:
+            return False
+
+    def write_step(self, timer, offset, states, runs, cycles=None, rest=None):
+        # one step's frames; the step is logged with its deadline, lateness and write latency,
+        # and with self.cycle unless cycles gives a {coil: cycle} of its own. rest is the
+        # {coil: state} the step's coils return to when released (default: all OFF).
+        # False if stopped.
+        while True:
+            started = time.perf_counter()
+            try:
+                write_coil_runs(self.connection, runs)
+                break
+            except LINK_ERRORS as e:
+                if not self.recover(e, offset, states, rest=rest):
+                    return False
+        latency = time.perf_counter() - started
+        lateness = timer.edge(offset)
+        self.wrote(states)
+        away = self.away_from_rest(states, rest)
+        for coil in states:
+            if coil in away:
+                self.held.setdefault(coil, away[coil])
+            else:
+                self.held.pop(coil, None)
+        log = self.log
+        if log is not None:
+            for coil, state in states.items():
+                log.edge(cycles[coil] if cycles else self.cycle, coil, state, offset, lateness, latency)
+        for coil, state in states.items():
+            self.post("state", coil, state)
+        return True
+
+    def read_states(self, coils, offset=None):
+        # None if stopped while the link was down; offset is the deadline of the step the read is for
+        while True:
+            started = time.perf_counter()
+            try:
+                states = read_coil_states(self.connection, coils)
+                break
+            except LINK_ERRORS as e:
+                if not self.recover(e, offset, {}, coils[0]):
+                    return None
+        log = self.log
+        if log is not None:
+            latency = time.perf_counter() - started
+            for coil, state in states.items():
+                log.read(self.cycle, coil, state, latency)
+        return states
+
+
+def check_sequence(coils, press_duration, wait_duration, cycles=None):
+    coils = list(coils)
+    if cycles is None and len(coils) * (press_duration + wait_duration) <= 0:
+        raise ValueError("a looping sequence needs a press or wait duration")
+    return coils
+
+
+# Presses each coil in turn for press_duration, waiting wait_duration between presses.
+# With a trusted cache, one batched read per cycle replaces the read before every press; a
+# pass longer than the cache's max_age gets another batched read when the first one expires.
+class SequenceRunner(Runner):
+    def __init__(self, connection, coils, press_duration, wait_duration, cycles=None, events=None, cache=None):
+        super().__init__(connection, cycles, events, cache)
+        self.coils = check_sequence(coils, press_duration, wait_duration, cycles)
+        self.press_duration = press_duration
+        self.wait_duration = wait_duration
+
+    @property
+    def pass_duration(self):
+        return len(self.coils) * (self.press_duration + self.wait_duration)
+
+    def run_cycle(self, timer, cycle):
+        offset = cycle * self.pass_duration
+        if self.cache and self.cache.trusted:
+            self.verify_cache(offset)
+        for coil in self.coils:
+            if not self.running:
+                return
+            current_state = self.cache.get(coil) if self.cache else None
+            if current_state is None and self.cache and self.cache.trusted:
+                if not self.verify_cache(offset):
+                    return
+                current_state = self.cache.get(coil)
+            if current_state is None:
+                # read ahead of the deadline so the press edge is a single write
+                states = self.read_states([coil], offset)
+                if states is None:
+                    return
+                current_state = states[coil]
+            if not (self.edge(timer, offset, coil, not current_state, current_state)
+                    and self.edge(timer, offset + self.press_duration, coil, current_state, current_state)):
+                return
+            offset += self.press_duration + self.wait_duration
+
+    def edge(self, timer, offset, coil, state, rest_state):
+        if not timer.sleep_until(offset):
+            return False
+        return self.write_step(timer, offset, {coil: state}, plan_coil_writes({coil: state}), rest={coil: rest_state})
+
+    def verify_cache(self, offset=None):
+        # False if stopped while the link was down
+        started = self.cache.clock()
+        states = self.read_states(self.coils, offset)
+        if states is None:
+            return False
+        for coil, (cached, state) in sorted(self.cache.verify(states, started).items()):
+            self.post("error", stale_message(coil, cached, state))
+        return True
+
+
+# Plays a compiled sequence_timeline.Timeline; every step is written with its precomputed frames.
+class TimelineRunner(Runner):
+    def __init__(self, connection, timeline, cycles=1, events=None, cache=None):
+        super().__init__(connection, cycles, events, cache)
+        self.timeline = timeline
+
+    @property
+    def pass_duration(self):
+        return self.timeline.duration
+
+    def run_cycle(self, timer, cycle):
+        base = cycle * self.timeline.duration
+        for offset, states, runs in self.timeline.steps:
+            if not (timer.sleep_until(base + offset) and self.write_step(timer, base + offset, states, runs)):
+                return
+
+
+# Edges of different channels due this close together are written as one step (seconds)
+TICK = 0.001
+
+
+class Channel:
+    def __init__(self, coil, press_duration, wait_duration, phase=0.0, cycles=None):
+        self.coil = coil
+        self.press_duration = press_duration
+        self.wait_duration = wait_duration
+        self.phase = phase
+        self.cycles = cycles
+
+    @property
+    def period(self):
+        return self.press_duration + self.wait_duration
+
+
+def check_channels(channels):
+    channels = list(channels)
+    coils = [channel.coil for channel in channels]
+    if len(set(coils)) != len(coils):
+        raise ValueError("every channel needs its own coil")
+    if any(channel.cycles is None and channel.period <= 0 for channel in channels):
+        raise ValueError("a looping channel needs a press or wait duration")
+    return channels
+
+
+# Runs independent press/wait loops on many coils from one thread. The next edge of every
+# channel waits in a heap keyed by its absolute offset; edges due within TICK of each other
+# go out together as bulk writes. Each channel toggles its coil from the state it had at start.
+class PeriodicRunner(Runner):
+    def __init__(self, connection, channels, events=None, cache=None):
+        super().__init__(connection, 1, events, cache)
+        self.channels = check_channels(channels)
+
+    @property
+    def pass_duration(self):
+        if any(channel.cycles is None for channel in self.channels):
+            return None
+        return max((channel.phase + channel.cycles * channel.period for channel in self.channels), default=0.0)
+
+    def run_cycle(self, timer, cycle):
+        initial = self.read_states([channel.coil for channel in self.channels])
+        if initial is None:
+            return
+        commanded = dict(initial)
+        sequence = itertools.count()
+        # (offset, tie-breaker, channel index, cycle number, pressing)
+        heap = [(channel.phase, next(sequence), index, 0, True)
+                for index, channel in enumerate(self.channels) if channel.cycles != 0]
+        heapq.heapify(heap)
+        while heap:
+            offset = heap[0][0]
+            states = {}
+            counts = {}
+            # a channel with press_duration 0 switches on and off at one offset: two steps
+            while heap and heap[0][0] <= offset + TICK and self.channels[heap[0][2]].coil not in states:
+                _, _, index, count, pressing = heapq.heappop(heap)
+                channel = self.channels[index]
+                start = channel.phase + count * channel.period
+                counts[channel.coil] = count
+                if pressing:
+                    states[channel.coil] = not initial[channel.coil]
+                    heapq.heappush(heap, (start + channel.press_duration, next(sequence), index, count, False))
+                else:
+                    states[channel.coil] = initial[channel.coil]
+                    if channel.cycles is None or count + 1 < channel.cycles:
+                        heapq.heappush(heap, (start + channel.period, next(sequence), index, count + 1, True))
+            if not timer.sleep_until(offset):
+                return
+            commanded.update(states)
+            if not self.write_step(timer, offset, states, plan_step_writes(states, commanded), counts, initial):
+                return
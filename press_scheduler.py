@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+# All timed holds live as timers on one asyncio loop running in a background thread.
+# State changes are handed to events (anything with a thread-safe put(), e.g. the UI queue):
+#   ("state", coil, state), ("done", coil), ("error", message)
+# With a trusted coil_cache.VerifiedCoilCache a press skips its read and writes straight away.
+class Hold:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.restore = True
+        self.task = asyncio.current_task()
+
+
+class PressScheduler:
+    def __init__(self, connection, events=None, cache=None):
+        self.connection = connection
+        self.events = events
+        self.cache = cache
+        self.holds = set()
+        # pymodbus 2.x's asyncio client does not run on current Python, so transactions
+        # go through the pooled sync connection; one worker per pooled socket is enough.
+        self.executor = ThreadPoolExecutor(max_workers=len(connection.clients))
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def press(self, coil, duration):
+        return asyncio.run_coroutine_threadsafe(self.hold(coil, duration), self.loop)
+
+    def cancel_all(self, restore=True):
+        # returns a future that completes once every cancelled hold has made its last write;
+        # restore=False leaves the coils as they are, for a caller about to release them all
+        return asyncio.run_coroutine_threadsafe(self.cancel_holds(restore), self.loop)
+
+    async def cancel_holds(self, restore=True):
+        holds = list(self.holds)
+        for hold in holds:
+            hold.restore = hold.restore and restore
+            hold.release.set()
+        await asyncio.gather(*(hold.task for hold in holds), return_exceptions=True)
+
+    def close(self, timeout=None):
+        # pending holds end now and restore their coils before the loop stops
+        try:
+            self.cancel_all(restore=True).result(timeout)
+        except FutureTimeoutError:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown(wait=False)
+
+    def post(self, *event):
+        if self.events is not None:
+            self.events.put(event)
+
+    async def transaction(self, method, *args):
+        result = await self.loop.run_in_executor(self.executor, getattr(self.connection, method), *args)
+        if result.isError():
+            raise IOError(f"{method}{args} failed: {result}")
+        return result
+
+    async def write(self, coil, state):
+        await self.transaction("write_coil", coil, state)
+        if self.cache:
+            self.cache.wrote({coil: state})
+        self.post("state", coil, state)
+
+    async def hold(self, coil, duration):
+        hold = Hold()
+        self.holds.add(hold)
+        pressed = False
+        try:
+            current_state = self.cache.get(coil) if self.cache else None
+            if current_state is None:
+                current_state = (await self.transaction("read_coils", coil, 1)).bits[0]
+            if hold.release.is_set():
+                # cancelled during the read, e.g. by Stop: the coil is never pressed
+                return
+            pressed = True
+            await self.write(coil, not current_state)
+            try:
+                await asyncio.wait_for(hold.release.wait(), duration)
+            except asyncio.TimeoutError:
+                pass
+        except Exception as e:
+            self.post("error", str(e))
+        finally:
+            try:
+                # once the press went out, the restore runs whatever failed in between
+                if pressed and hold.restore:
+                    await self.write(coil, current_state)
+            except Exception as e:
+                self.post("error", str(e))
+            finally:
+                self.holds.discard(hold)
+                self.post("done", coil)
@@ -0,0 +1,42 @@
+import json
+import os
+
+# Named rigs in a small JSON file, e.g.
+#   {"last": "rig1",
+#    "profiles": {"rig1": {"ip": "10.3.200.10", "port": 502, "coils": [8192, 8193, 8194, 8195],
+#                          "sequence": "1,2,3,4", "press": 2.0, "wait": 1.0, "poll_budget": 5.0}}}
+# MODBUS_PUSHER_PROFILES points the scripts at another file.
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".modbus_pusher.json")
+DEFAULTS = {"ip": "10.3.200.10", "port": 502, "coils": [8192, 8193, 8194, 8195]}
+
+
+class ProfileStore:
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("MODBUS_PUSHER_PROFILES", DEFAULT_PATH)
+        self.last = None
+        self.profiles = {}
+        try:
+            with open(self.path) as config_file:
+                data = json.load(config_file)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            raise ValueError(f"{self.path}: {e}") from None
+        self.last = data.get("last")
+        self.profiles = data.get("profiles", {})
+
+    def get(self, name=None):
+        # the named profile over the defaults; no name means the last one used, if any
+        name = name or self.last
+        if name is not None and name not in self.profiles:
+            raise ValueError(f"unknown profile '{name}' (known: {', '.join(sorted(self.profiles)) or 'none'})")
+        return {**DEFAULTS, **self.profiles.get(name, {})}
+
+    def save(self, name, **fields):
+        self.profiles[name] = {**self.profiles.get(name, {}), **fields}
+        self.last = name
+        # written to a temporary file first so a crash never leaves half a config behind
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as config_file:
+            json.dump({"last": self.last, "profiles": self.profiles}, config_file, indent=2)
+        os.replace(temporary, self.path)
@@ -0,0 +1,296 @@
+import argparse
+import sys
+import time
+from coil_batch import read_coil_states, release_coils
+from coil_cache import VerifiedCoilCache
+from connection_watchdog import ConnectionWatchdog
+from cycle_log import DEFAULT_MAX_BYTES, CycleLog
+from dry_run import DEFAULT_HORIZON, dry_run
+from metrics import registry
+from modbus_connection import ModbusConnection
+from multi_device import MAX_WORKERS, FanOut, parse_devices
+from profiles import DEFAULTS, ProfileStore
+from press_engine import Channel, PeriodicRunner, SequenceRunner, TimelineRunner, check_channels, check_sequence
+from register_batch import format_values, parse_register_channels, read_register_values
+from sequence_timeline import load_timeline
+from session_recorder import load_session_timeline
+from transaction_scheduler import EMERGENCY
+
+
+def parse_numbers(text):
+    return list(map(int, text.split(',')))
+
+
+def parse_coil_map(text):
+    pairs = (item.split(':') for item in text.split(','))
+    return {int(old): int(new) for old, new in pairs}
+
+
+def parse_channel(text):
+    button, press, wait, *phase = text.split(':')
+    return int(button), float(press), float(wait), float(phase[0]) if phase else 0.0
+
+
+def button_coil(coils, button):
+    if not 1 <= button <= len(coils):
+        raise ValueError(f"button {button} does not exist (1-{len(coils)})")
+    return coils[button - 1]
+
+
+class EventPrinter:
+    def __init__(self, prefix="", log=None):
+        self.prefix = prefix
+        self.log = log
+        self.errors = 0
+
+    def put(self, event):
+        if event[0] == "state":
+            print(f"{self.prefix}coil {event[1]} -> {'ON' if event[2] else 'OFF'}", flush=True)
+        elif event[0] == "error":
+            self.errors += 1
+            if self.log is not None:
+                self.log.error(event[1])
+            print(f"{self.prefix}error: {event[1]}", file=sys.stderr, flush=True)
+        elif event[0] == "link":
+            print(f"{self.prefix}link {'up' if event[1] else 'DOWN, reconnecting'}", file=sys.stderr, flush=True)
+        elif event[0] == "resumed":
+            released = f", released coils {event[2]}" if event[2] else ""
+            print(f"{self.prefix}resumed after {event[1]:.1f} s{released}", file=sys.stderr, flush=True)
+
+
+def build_parser(profile=DEFAULTS):
+    # Arguments can also be read from a file: pusher_cli.py @rig1.args sequence
+    # and the defaults from a saved profile (see profiles.py): pusher_cli.py --profile rig1 sequence
+    parser = argparse.ArgumentParser(description="Headless Modbus coil pusher", fromfile_prefix_chars="@")
+    parser.add_argument("--profile", default=None, help="take --ip, --port, --coils and the sequence from a profile")
+    parser.add_argument("--ip", default=profile["ip"])
+    parser.add_argument("--port", type=int, default=profile["port"])
+    parser.add_argument("--coils", type=parse_numbers, default=profile["coils"],
+                        help="coil numbers (comma separated), button N is the Nth coil")
+    parser.add_argument("--registers", type=parse_register_channels, default=profile.get("registers", ""),
+                        metavar="NAME=TABLE:ADDRESS[:TYPE[:COUNT[:ORDER]]],...",
+                        help="register channels shown by status, e.g. force=ir:100:float32:4:CDAB "
+                             "(TABLE hr/ir, TYPE int16/uint16/int32/uint32/float32, ORDER ABCD/CDAB/BADC/DCBA)")
+    parser.add_argument("--devices", type=parse_devices, default=None,
+                        help="run press/sequence/loops/recipe/replay on several devices at once: host[:port],host[:port],...")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="maximum devices driven in parallel")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="maximum Modbus transactions per second per device (Stop releases are never held back)")
+    parser.add_argument("--verbose", action="store_true", help="print every edge of every device with --devices")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    parser.add_argument("--stats", action="store_true", help="print transaction latency statistics on exit")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="run press/sequence/loops/recipe/replay in virtual time against in-memory coils")
+    parser.add_argument("--until", type=float, default=DEFAULT_HORIZON,
+                        help="with --dry-run: stop at this virtual time in seconds (default: 24 h)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="with --dry-run: simulated seconds per Modbus transaction")
+    parser.add_argument("--timeline", action="store_true", help="with --dry-run: print every edge")
+    parser.add_argument("--log", default=None, metavar="FILE",
+                        help="stream every edge and read-back to numbered files FILE.000, FILE.001, ... "
+                             "(CSV, or the compact columnar format if FILE ends in .cyc)")
+    parser.add_argument("--log-size", type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help="start the next log file after this many MiB")
+    parser.add_argument("--max-outage", type=float, default=None,
+                        help="give up after the device has been unreachable this many seconds "
+                             "(default: keep reconnecting and resume where the run stopped)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="print the current state of every coil and register channel")
+    commands.add_parser("release", help="switch every coil off")
+
+    press = commands.add_parser("press", help="press one button for a duration")
+    press.add_argument("button", type=int)
+    press.add_argument("--duration", type=float, default=10)
+
+    sequence = commands.add_parser("sequence", help="press buttons in order, like Puser_Sequence")
+    sequence.add_argument("--sequence", type=parse_numbers, default=parse_numbers(profile.get("sequence", "1,2,3,4")))
+    sequence.add_argument("--press", type=float, default=profile.get("press", 2))
+    sequence.add_argument("--wait", type=float, default=profile.get("wait", 1))
+    sequence.add_argument("--cycles", type=int, default=None, help="number of passes (default: loop until Ctrl+C)")
+    sequence.add_argument("--trust-cache", action="store_true",
+                          help="read all coils once per pass instead of before every press")
+
+    recipe = commands.add_parser("recipe", help="play a recipe file (see sequence_timeline.py for the format)")
+    recipe.add_argument("file")
+    recipe.add_argument("--cycles", type=int, default=1, help="number of passes (0: loop until Ctrl+C)")
+
+    loops = commands.add_parser("loops", help="run independent press/wait loops on several buttons at once")
+    loops.add_argument("channels", nargs="+", type=parse_channel, metavar="BUTTON:PRESS:WAIT[:PHASE]")
+    loops.add_argument("--cycles", type=int, default=None, help="presses per button (default: loop until Ctrl+C)")
+
+    replay = commands.add_parser("replay", help="replay a session recorded in Pusher_Manuel")
+    replay.add_argument("file")
+    replay.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    replay.add_argument("--map", type=parse_coil_map, default=None,
+                        help="replay on other coils: recorded:target,recorded:target,...")
+    return parser
+
+
+def runner_factory(args):
+    # Returns make_runner(connection, events) and the coils it drives, for the engine commands
+    if args.command == "press":
+        coils = [button_coil(args.coils, args.button)]
+        return lambda connection, events: SequenceRunner(connection, coils, args.duration, 0, 1, events), coils
+    if args.command == "sequence":
+        coils = check_sequence([button_coil(args.coils, button) for button in args.sequence],
+                               args.press, args.wait, args.cycles)
+        return (lambda connection, events: SequenceRunner(
+            connection, coils, args.press, args.wait, args.cycles, events,
+            VerifiedCoilCache(trusted=True) if args.trust_cache else None), coils)
+    if args.command == "recipe":
+        timeline = load_timeline(args.file, args.coils)
+        print(f"{args.file}: {len(timeline.steps)} steps, {timeline.frames} write frames, "
+              f"{timeline.duration:.3f} s per pass")
+        return (lambda connection, events: TimelineRunner(connection, timeline, args.cycles or None, events),
+                timeline.coils)
+    if args.command == "loops":
+        channels = check_channels(Channel(button_coil(args.coils, button), press, wait, phase, args.cycles)
+                                  for button, press, wait, phase in args.channels)
+        return (lambda connection, events: PeriodicRunner(connection, channels, events),
+                [channel.coil for channel in channels])
+    if args.command == "replay":
+        timeline = load_session_timeline(args.file, args.speed, args.map)
+        print(f"{args.file}: {len(timeline.steps)} steps, {timeline.duration:.3f} s at {args.speed:g}x")
+        return lambda connection, events: TimelineRunner(connection, timeline, 1, events), timeline.coils
+    return None, args.coils
+
+
+def open_log(args):
+    return CycleLog(args.log, int(args.log_size * 2 ** 20)) if args.log else None
+
+
+def close_log(log):
+    if log is not None:
+        log.close()
+        dropped = f", {log.dropped} dropped" if log.dropped else ""
+        print(f"{log.rows} log rows in {', '.join(log.paths)}{dropped}")
+
+
+def run_engine(connection, make_runner, coils, log=None, max_outage=None):
+    printer = EventPrinter(log=log)
+    runner = make_runner(connection, printer)
+    runner.log = log
+    runner.max_outage = max_outage
+    # notices a dead link during long presses and waits, before the next edge runs into it
+    watchdog = ConnectionWatchdog(connection, coils[0], printer).start()
+    try:
+        runner.run()
+    except KeyboardInterrupt:
+        started = time.perf_counter()
+        runner.stop()
+        with connection.priority(EMERGENCY):
+            release_coils(connection, coils)
+        print(f"stopped, coils released and read back in {(time.perf_counter() - started) * 1000:.1f} ms")
+    finally:
+        watchdog.stop()
+    print(runner.timer.summary())
+    return 1 if printer.errors else 0
+
+
+def run_fan_out(devices, make_runner, coils, workers, verbose, rate=None):
+    fan_out = FanOut(devices, make_runner, coils, workers,
+                     events_for=lambda device: EventPrinter(f"{device[0]}:{device[1]} ") if verbose else None,
+                     rate=rate)
+    started = time.monotonic()
+    results = fan_out.run()
+    wall_time = time.monotonic() - started
+    for result in results:
+        host, port = result.device
+        timing = result.timer.summary() if result.timer else "-"
+        status = "ok" if result.ok else "FAILED: " + "; ".join(result.errors)
+        print(f"{host}:{port}  {result.elapsed:.2f} s  {timing}  {status}")
+    failed = sum(not result.ok for result in results)
+    print(f"{len(results) - failed}/{len(results)} devices ok, wall time {wall_time:.2f} s")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    parser = args.parser
+    try:
+        make_runner, coils = runner_factory(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.dry_run:
+        if make_runner is None:
+            parser.error("--dry-run only supports the press, sequence, loops, recipe and replay commands")
+        return run_dry_run(args, make_runner, coils)
+    metrics_server = None
+    if args.metrics_port is not None:
+        from metrics_server import MetricsServer
+        metrics_server = MetricsServer(port=args.metrics_port).start()
+    try:
+        return run_command(args, parser, make_runner, coils)
+    finally:
+        if metrics_server:
+            metrics_server.stop()
+        if args.stats:
+            print("\n".join(registry.summary_lines()))
+
+
+def run_dry_run(args, make_runner, coils):
+    log = open_log(args)
+    try:
+        report = dry_run(make_runner, coils, args.until, args.latency, log)
+    finally:
+        close_log(log)
+    if args.timeline:
+        print("\n".join(report.timeline_lines()))
+    print("\n".join(report.summary_lines()))
+    return 1 if report.errors else 0
+
+
+def parse_arguments(argv=None):
+    # --profile is read first, so that its values become defaults the other options override
+    early = argparse.ArgumentParser(add_help=False, fromfile_prefix_chars="@")
+    early.add_argument("--profile", default=None)
+    profile_name = early.parse_known_args(argv)[0].profile
+    parser = build_parser()
+    if profile_name is not None:
+        try:
+            parser = build_parser(ProfileStore().get(profile_name))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    args = parser.parse_args(argv)
+    args.parser = parser
+    return args
+
+
+def run_command(args, parser, make_runner, coils):
+    if args.devices:
+        if make_runner is None:
+            parser.error("--devices only supports the press, sequence, loops, recipe and replay commands")
+        if args.log:
+            parser.error("--log only supports a single device")
+        return run_fan_out(args.devices, make_runner, coils, args.workers, args.verbose, args.rate)
+    connection = ModbusConnection(args.ip, args.port, rate=args.rate)
+    if not connection.connect():
+        print(f"Failed to connect to Modbus server {args.ip}:{args.port}", file=sys.stderr)
+        return 2
+    try:
+        if args.command == "status":
+            for coil, state in sorted(read_coil_states(connection, args.coils).items()):
+                print(f"coil {coil}: {'ON' if state else 'OFF'}")
+            for name, values in read_register_values(connection, args.registers).items():
+                print(f"{name}: {format_values(values)}")
+        elif args.command == "release":
+            states = release_coils(connection, args.coils)
+            stuck = sorted(coil for coil, state in states.items() if state)
+            if stuck:
+                print(f"Coils still on after release: {stuck}", file=sys.stderr)
+                return 1
+        else:
+            log = open_log(args)
+            try:
+                return run_engine(connection, make_runner, coils, log, args.max_outage)
+            finally:
+                close_log(log)
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,553 @@
+import argparse
+import threading
+import time
+import tkinter as tk
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from tkinter import simpledialog, messagebox
+from coil_batch import read_coil_states, write_coil_states
+from coil_cache import CoilStateCache, VerifiedCoilCache
+from coil_grid import CoilGrid
+from coil_monitor import DEFAULT_BUDGET, CoilMonitor
+from connection_watchdog import ConnectionWatchdog
+from cycle_log import CycleLog
+from metrics import DEFAULT_METRICS_PORT, registry
+from modbus_connection import DEFAULT_TIMEOUT, ModbusConnection
+from press_engine import Channel, PeriodicRunner, SequenceRunner, TimelineRunner, check_channels, check_sequence
+from press_scheduler import PressScheduler
+from profiles import DEFAULTS, ProfileStore
+from register_batch import format_values, parse_register_channels
+from session_recorder import RecordingSink, SessionRecorder, load_session_timeline
+from transaction_scheduler import EMERGENCY
+from ui_queue import UiEventQueue
+
+DEFAULT_COILS_TEXT = ",".join(map(str, DEFAULTS["coils"]))
+# coil maps larger than this get the scrolling CoilGrid instead of a script's fixed layout
+GRID_THRESHOLD = 8
+
+class CustomDialog(simpledialog.Dialog):
+    def __init__(self, parent, profile=DEFAULTS, profile_name=None, title=None):
+        self.profile = profile
+        self.initial_profile_name = profile_name or ""
+        self.ip_address = ""
+        self.port = ""
+        self.coil_numbers = ""
+        self.registers = ""
+        self.profile_name = ""
+        super().__init__(parent, title)
+
+    def body(self, master):
+        tk.Label(master, text="IP Address:").grid(row=0)
+        tk.Label(master, text="Port:").grid(row=1)
+        tk.Label(master, text="Coil Numbers (comma separated):").grid(row=2)
+        tk.Label(master, text="Register Channels (optional):").grid(row=3)
+        tk.Label(master, text="Save as Profile (optional):").grid(row=4)
+        
+        self.ip_entry = tk.Entry(master)
+        self.port_entry = tk.Entry(master)
+        self.coils_entry = tk.Entry(master)
+        self.registers_entry = tk.Entry(master)
+        self.profile_entry = tk.Entry(master)
+
+        self.ip_entry.insert(0, self.profile["ip"])
+        self.port_entry.insert(0, str(self.profile["port"]))
+        self.coils_entry.insert(0, ",".join(map(str, self.profile["coils"])))
+        self.registers_entry.insert(0, self.profile.get("registers", ""))
+        self.profile_entry.insert(0, self.initial_profile_name)
+
+        self.ip_entry.bind("<FocusIn>", self.clear_ip_placeholder)
+        self.port_entry.bind("<FocusIn>", self.clear_port_placeholder)
+        self.coils_entry.bind("<FocusIn>", self.clear_coils_placeholder)
+
+        self.ip_entry.grid(row=0, column=1)
+        self.port_entry.grid(row=1, column=1)
+        self.coils_entry.grid(row=2, column=1)
+        self.registers_entry.grid(row=3, column=1)
+        self.profile_entry.grid(row=4, column=1)
+
+        return self.ip_entry
+
+    def clear_ip_placeholder(self, event):
+        if self.ip_entry.get() == "Enter IP address":
+            self.ip_entry.delete(0, tk.END)
+
+    def clear_port_placeholder(self, event):
+        if self.port_entry.get() == "Enter port number":
+            self.port_entry.delete(0, tk.END)
+
+    def clear_coils_placeholder(self, event):
+        if self.coils_entry.get() == DEFAULT_COILS_TEXT:
+            self.coils_entry.delete(0, tk.END)
+
+    def validate(self):
+        # e.g. force=ir:100:float32:4:CDAB,presses=hr:10:uint32 (see register_batch.py)
+        try:
+            parse_register_channels(self.registers_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid register channels", str(e), parent=self)
+            return False
+        return True
+
+    def apply(self):
+        self.ip_address = self.ip_entry.get()
+        self.port = int(self.port_entry.get())
+        self.coil_numbers = list(map(int, self.coils_entry.get().split(',')))
+        self.registers = self.registers_entry.get().strip()
+        self.profile_name = self.profile_entry.get().strip()
+
+def command_line_profile(argv=None):
+    # Every GUI script takes --profile NAME to open a saved rig without the settings dialog
+    parser = argparse.ArgumentParser(description="Modbus coil control window")
+    parser.add_argument("--profile", default=None, help="connection profile saved from the settings dialog")
+    return parser.parse_args(argv).profile
+
+# Channels queued in an automatic control window; each one is a press_engine.Channel
+class ChannelList(tk.Frame):
+    def __init__(self, master, coil_numbers):
+        super().__init__(master)
+        self.coil_numbers = coil_numbers
+        self.channels = []
+        self.listbox = tk.Listbox(self, height=6, width=48)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        tk.Button(self, text="Remove", command=self.remove_selected).pack(padx=5, pady=2)
+        tk.Button(self, text="Clear", command=self.clear).pack(padx=5, pady=2)
+
+    def add(self, channel):
+        # one channel per coil: adding a button again replaces its settings
+        for index, existing in enumerate(self.channels):
+            if existing.coil == channel.coil:
+                self.channels.pop(index)
+                self.listbox.delete(index)
+                break
+        self.channels.append(channel)
+        cycles = "loop" if channel.cycles is None else f"{channel.cycles}x"
+        self.listbox.insert(tk.END, f"Button {self.coil_numbers.index(channel.coil) + 1}: "
+                                    f"press {channel.press_duration:g} s, wait {channel.wait_duration:g} s, "
+                                    f"phase {channel.phase:g} s, {cycles}")
+
+    def remove_selected(self):
+        for index in reversed(self.listbox.curselection()):
+            self.channels.pop(index)
+            self.listbox.delete(index)
+
+    def clear(self):
+        self.channels.clear()
+        self.listbox.delete(0, tk.END)
+
+# Automatic control with press_engine.Channel loops, for a ModbusAppBase whose settings window has
+# press_duration_entry, wait_duration_entry, phase_entry, button_var, loop_var and a ChannelList
+class ChannelControls:
+    def read_channel(self):
+        try:
+            press_duration = float(self.press_duration_entry.get())
+            wait_duration = float(self.wait_duration_entry.get())
+            phase = float(self.phase_entry.get() or 0)
+        except ValueError:
+            messagebox.showerror("Invalid input", "Please enter valid durations in seconds.")
+            return None
+
+        button_index = int(self.button_var.get().split()[-1]) - 1
+        coil = self.coil_numbers[button_index]
+        return Channel(coil, press_duration, wait_duration, phase, None if self.loop_var.get() else 1)
+
+    def add_channel(self):
+        channel = self.read_channel()
+        if channel:
+            self.channel_list.add(channel)
+
+    def queued_channels(self):
+        # every queued channel runs at once; with none queued, the entry fields make the only one
+        channels = list(self.channel_list.channels)
+        if not channels:
+            channel = self.read_channel()
+            channels = [channel] if channel else []
+        return channels
+
+    def start_automatic_control(self):
+        # True once the channels are running
+        channels = self.queued_channels()
+        if not channels:
+            return False
+        try:
+            self.start_channels(channels)
+        except ValueError as e:
+            messagebox.showerror("Invalid input", str(e))
+            return False
+        return True
+
+    def dry_run_automatic_control(self):
+        channels = self.queued_channels()
+        if not channels:
+            return
+        try:
+            self.dry_run_channels(channels)
+        except ValueError as e:
+            messagebox.showerror("Invalid input", str(e))
+
+# Shared plumbing for the coil control windows; each script adds its own widgets and button layout
+class ModbusAppBase:
+    on_color = "#039b4e"
+    off_color = "#F70D1A"
+    frame_interval = 40
+    stats_interval = 1000
+    metrics_port = DEFAULT_METRICS_PORT
+    # start with presses trusting the verified state cache instead of reading first
+    trust_cached_states = False
+    # how long Stop waits for in-flight writes of holds and runners before releasing anyway
+    stop_timeout = 2 * DEFAULT_TIMEOUT
+    # transactions per second allowed to the PLC (None: unlimited); Stop is never held back
+    request_rate = None
+    # read requests per second the coil monitor may spend on polling; a profile's "poll_budget" wins
+    poll_budget = DEFAULT_BUDGET
+
+    def __init__(self, root, profile_name=None, profiles=None):
+        self.root = root
+        self.root.title("Modbus Coil Control")
+        
+        try:
+            self.profiles = profiles or ProfileStore()
+            profile = self.choose_profile(profile_name)
+            register_channels = parse_register_channels(profile.get("registers", "")) if profile else []
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Profile Error", str(e))
+            self.root.destroy()
+            return
+        if profile is None:
+            self.root.destroy()
+            return
+        self.profile = profile
+        self.ip_address = profile["ip"]
+        self.port = profile["port"]
+        self.coil_numbers = profile["coils"]
+        self.register_channels = register_channels
+        
+        # the window is built while the connection opens in the background
+        self.modbus_client = ModbusConnection(self.ip_address, self.port, rate=self.request_rate)
+        self.metrics_server = None
+        self.closed = False
+        self.ui_events = UiEventQueue()
+        # manual presses go through press_events so a session recording can tap them
+        self.press_events = RecordingSink(self.ui_events)
+        self.state_cache = VerifiedCoilCache(trusted=self.trust_cached_states)
+        self.press_scheduler = PressScheduler(self.modbus_client, self.press_events, self.state_cache)
+        self.sequence_runner = None
+        # while a cycle_log.CycleLog is open, runners stream into it and errors go there instead of popups
+        self.cycle_log = None
+        self.last_stop = ""
+        self.last_error = ""
+        self.link_status = f"Connecting to {self.modbus_client.device}..."
+
+        
+        self.buttons = []
+        self.coil_items = {}
+        self.coil_cache = CoilStateCache()
+        self.coil_grid = None
+        self.coil_monitor = None
+        self.create_interface()
+        # with a grid only the coils on screen are polled
+        polled = self.coil_grid.visible if self.coil_grid else self.coil_items
+        self.coil_monitor = CoilMonitor(self.modbus_client, polled, self.ui_events, active=self.controls_active,
+                                        budget=self.profile.get("poll_budget", self.poll_budget),
+                                        cache=self.state_cache, registers=self.register_channels)
+        self.create_stats_panel()
+        # opens the connection, then keeps retrying with backoff whenever the link drops
+        self.watchdog = ConnectionWatchdog(self.modbus_client, self.coil_numbers[0], self.ui_events).start()
+        self.process_ui_events()
+
+    def choose_profile(self, profile_name):
+        # A named profile opens without the dialog; otherwise the dialog starts from the last one used
+        if profile_name is not None:
+            self.profile_name = profile_name
+            return self.profiles.get(profile_name)
+        dialog = CustomDialog(self.root, self.profiles.get(), self.profiles.last, title="Modbus Settings")
+        if not dialog.ip_address:
+            return None
+        profile = {"ip": dialog.ip_address, "port": dialog.port, "coils": dialog.coil_numbers,
+                   "registers": dialog.registers}
+        self.profile_name = dialog.profile_name or None
+        if self.profile_name:
+            self.profiles.save(self.profile_name, **profile)
+        return profile
+
+    def remember(self, **fields):
+        # stores e.g. the last sequence in the current profile, so the next launch starts from it
+        if self.profile_name:
+            try:
+                self.profiles.save(self.profile_name, **fields)
+            except OSError:
+                pass
+
+    def start_metrics_server(self):
+        from metrics_server import MetricsServer
+        try:
+            # Prometheus text on http://127.0.0.1:<metrics_port>/metrics; a second window just goes without
+            self.metrics_server = MetricsServer(port=self.metrics_port).start()
+        except OSError:
+            pass
+
+    def create_interface(self):
+        raise NotImplementedError
+
+    def process_ui_events(self):
+        try:
+            frame = self.ui_events.drain()
+            if frame.states:
+                self.show_states(frame.states)
+            if frame.registers:
+                self.show_registers(frame.registers)
+            if frame.edges:
+                self.coil_monitor.wake()
+            for event in frame.events:
+                self.handle_event(event)
+            if frame.errors and not self.closed:
+                self.show_errors(frame.errors)
+        finally:
+            # a handler that raises must not stop the window from ever updating again
+            if not self.closed:
+                self.root.after(self.frame_interval, self.process_ui_events)
+
+    def show_errors(self, errors):
+        # a modal popup would hold up an unattended soak test, so a logged run only notes the last error
+        if self.cycle_log is None:
+            messagebox.showerror("Error", "\n".join(errors))
+            return
+        for error in errors:
+            self.cycle_log.error(error)
+        self.last_error = f"Last error ({time.strftime('%H:%M:%S')}): {errors[-1]}"
+
+    def create_stats_panel(self):
+        self.stats_label = tk.Label(self.root, text="", font=("Courier", 8), justify=tk.LEFT, anchor="w")
+        self.stats_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.registers_label = tk.Label(self.root, text="", font=("Courier", 9), justify=tk.LEFT, anchor="w")
+        if self.register_channels:
+            self.registers_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.trust_cache_var = tk.BooleanVar(value=self.state_cache.trusted)
+        tk.Checkbutton(self.root, text="Skip read before press (trust cached states)", variable=self.trust_cache_var,
+                       command=self.toggle_trust_cache).pack(side=tk.BOTTOM, anchor="w", padx=5)
+        self.refresh_stats()
+
+    def toggle_trust_cache(self):
+        self.state_cache.trusted = self.trust_cache_var.get()
+
+    def refresh_stats(self):
+        lines = registry.summary_lines(self.modbus_client.device)
+        if self.link_status:
+            lines.insert(0, self.link_status)
+        if self.last_stop:
+            lines.append(self.last_stop)
+        if self.cycle_log:
+            lines.append(f"Logging to {self.cycle_log.paths[-1]}: {self.cycle_log.rows} rows, "
+                         f"{self.cycle_log.dropped} dropped")
+        if self.last_error:
+            lines.append(self.last_error)
+        self.stats_label.config(text="\n".join(lines))
+        self.root.after(self.stats_interval, self.refresh_stats)
+
+    def show_registers(self, values):
+        self.registers_label.config(text="\n".join(f"{channel.name}: {format_values(values[channel.name])}"
+                                                   for channel in self.register_channels))
+
+    def use_coil_grid(self):
+        return len(self.coil_numbers) > GRID_THRESHOLD
+
+    def create_coil_grid(self, master=None, columns=4):
+        self.coil_grid = CoilGrid(master or self.root, self.coil_numbers, lambda coil: self.toggle_coil(coil, None),
+                                  self.coil_cache.get, self.visible_coils_changed, columns,
+                                  on_color=self.on_color, off_color=self.off_color)
+        self.coil_grid.pack(pady=10, fill=tk.BOTH, expand=True)
+
+    def visible_coils_changed(self, coils):
+        if self.coil_monitor:
+            self.coil_monitor.set_coils(coils)
+
+    def register_button(self, btn, coil, canvas):
+        self.buttons.append((btn, coil, canvas))
+        self.coil_items.setdefault(coil, []).append((canvas, btn))
+
+    def handle_event(self, event):
+        if event[0] == "link":
+            if not event[1]:
+                lost = "lost" if self.coil_monitor.running else "failed"
+                self.link_status = f"Connection to {self.modbus_client.device} {lost}, retrying..."
+            elif not self.coil_monitor.running:
+                # first connection: the monitor's first poll paints the real coil states
+                self.link_status = ""
+                self.coil_monitor.start()
+                threading.Thread(target=self.start_metrics_server, daemon=True).start()
+            else:
+                self.link_status = f"Reconnected to {self.modbus_client.device} at {time.strftime('%H:%M:%S')}"
+                self.coil_monitor.wake()
+        elif event[0] == "resumed":
+            _, outage, released = event
+            self.link_status = (f"Sequence resumed after a {outage:.1f} s outage"
+                                + (f", released coils {released}" if released else ""))
+        elif event[0] == "dry_run":
+            messagebox.showinfo("Dry Run", "\n".join(event[1]))
+        elif event[0] == "released":
+            _, latency, stuck = event
+            self.last_stop = f"Last stop: coils released {latency * 1000:.1f} ms after Stop"
+            if stuck:
+                messagebox.showerror("Error", f"Coils still on after release: {stuck}")
+
+    def show_states(self, states):
+        changed = self.coil_cache.update(states)
+        for coil, state in changed.items():
+            color = self.on_color if state else self.off_color
+            for canvas, item in self.coil_items.get(coil, ()):
+                canvas.itemconfig(item, fill=color)
+        if self.coil_grid:
+            self.coil_grid.paint(changed)
+
+    def controls_active(self):
+        return bool(self.press_scheduler.holds) or (self.sequence_runner is not None and self.sequence_runner.is_alive())
+
+    def start_sequence(self, coils, press_duration, wait_duration, cycles=None):
+        self.start_runner(SequenceRunner(self.modbus_client, coils, press_duration, wait_duration,
+                                         cycles, self.ui_events, self.state_cache))
+
+    def start_channels(self, channels):
+        self.start_runner(PeriodicRunner(self.modbus_client, channels, self.ui_events, self.state_cache))
+
+    def dry_run_sequence(self, coils, press_duration, wait_duration, cycles=None):
+        # invalid settings raise ValueError here, before anything runs
+        coils = check_sequence(coils, press_duration, wait_duration, cycles)
+        self.show_dry_run(lambda connection, events: SequenceRunner(connection, coils, press_duration, wait_duration,
+                                                                    cycles, events), coils)
+
+    def dry_run_channels(self, channels):
+        channels = check_channels(channels)
+        self.show_dry_run(lambda connection, events: PeriodicRunner(connection, channels, events),
+                          [channel.coil for channel in channels])
+
+    def show_dry_run(self, make_runner, coils):
+        # the same engine in virtual time against in-memory coils; a looping run stops after 24 h,
+        # which takes about a second, so it runs off the Tk thread and reports as ("dry_run", lines)
+        threading.Thread(target=self.run_dry_run, args=(make_runner, coils), daemon=True).start()
+
+    def run_dry_run(self, make_runner, coils):
+        from dry_run import dry_run
+        try:
+            report = dry_run(make_runner, coils)
+        except Exception as e:
+            self.ui_events.put(("error", f"Dry run failed: {e}"))
+            return
+        self.ui_events.put(("dry_run", report.summary_lines()))
+
+    def start_timeline(self, timeline, cycles=1):
+        self.start_runner(TimelineRunner(self.modbus_client, timeline, cycles, self.ui_events, self.state_cache))
+
+    def start_replay(self, path, speed=1.0):
+        self.start_timeline(load_session_timeline(path, speed))
+
+    def start_recording(self, path):
+        self.stop_recording()
+        self.press_events.recorder = SessionRecorder(path)
+
+    def stop_recording(self):
+        recorder, self.press_events.recorder = self.press_events.recorder, None
+        if recorder is not None:
+            recorder.close()
+        return recorder
+
+    def start_cycle_log(self, path):
+        self.stop_cycle_log()
+        self.cycle_log = CycleLog(path)
+        if self.sequence_runner:
+            self.sequence_runner.log = self.cycle_log
+
+    def stop_cycle_log(self):
+        log, self.cycle_log = self.cycle_log, None
+        if self.sequence_runner:
+            self.sequence_runner.log = None
+        if log is not None:
+            # the writer thread flushes what is queued; a runner can no longer add to it
+            threading.Thread(target=log.close, daemon=True).start()
+        return log
+
+    def start_runner(self, runner):
+        previous = self.sequence_runner
+        self.stop_sequence()
+        runner.log = self.cycle_log
+        self.sequence_runner = runner
+        threading.Thread(target=self.replace_runner, args=(previous, runner), daemon=True).start()
+
+    def replace_runner(self, previous, runner):
+        # a runner takes the states it finds as the coils' rest states, so the one it replaces
+        # must have ended and put its pressed coils back first
+        if previous is not None:
+            self.release_runner(previous)
+        runner.start()
+
+    def release_runner(self, runner):
+        runner.join(self.stop_timeout)
+        try:
+            with self.modbus_client.priority(EMERGENCY):
+                runner.release_held()
+        except Exception as e:
+            self.ui_events.put(("error", f"Release failed: {e}"))
+
+    def stop_sequence(self):
+        running = self.sequence_runner is not None and self.sequence_runner.is_alive()
+        if self.sequence_runner:
+            self.sequence_runner.stop()
+        return running
+
+    def stop_all(self):
+        # Every hold and runner wait ends at once; the release itself runs off the Tk thread
+        # and is reported back as ("released", seconds since Stop, coils still on).
+        started = time.perf_counter()
+        runner = self.sequence_runner
+        self.stop_sequence()
+        holds_done = self.press_scheduler.cancel_all(restore=False)
+        threading.Thread(target=self.release_after_stop, args=(started, runner, holds_done), daemon=True).start()
+
+    def release_after_stop(self, started, runner, holds_done):
+        # a write still in flight must not land after the release; one that outlasts stop_timeout
+        # is released over anyway, and a late hold is released once more when it finally ends
+        try:
+            holds_done.result(self.stop_timeout)
+            late_holds = None
+        except FutureTimeoutError:
+            late_holds = holds_done
+        if runner is not None:
+            runner.join(self.stop_timeout)
+        if self.release_coils(started) and runner is not None:
+            # everything is off now, so a restart has nothing of this runner's left to release
+            runner.held.clear()
+        if late_holds is not None:
+            late_holds.result()
+            self.release_coils(started)
+
+    def release_coils(self, started):
+        coils = list(self.coil_numbers)
+        try:
+            self.state_cache.wrote(dict.fromkeys(coils, False))
+            with self.modbus_client.priority(EMERGENCY):
+                write_coil_states(self.modbus_client, dict.fromkeys(coils, False))
+                latency = time.perf_counter() - started
+                read_started = self.state_cache.clock()
+                states = read_coil_states(self.modbus_client, coils)
+        except Exception as e:
+            self.ui_events.put(("error", f"Release failed: {e}"))
+            return False
+        self.state_cache.verify(states, read_started)
+        # through press_events, so a session recording ends the holds that Stop cut short
+        self.press_events.put(("states", states))
+        self.ui_events.put(("released", latency, sorted(coil for coil, state in states.items() if state)))
+        return True
+
+    def on_closing(self):
+        self.closed = True
+        self.stop_sequence()
+        if self.sequence_runner is not None:
+            self.release_runner(self.sequence_runner)
+        self.stop_recording()
+        log = self.stop_cycle_log()
+        if log is not None:
+            log.thread.join(2)
+        self.coil_monitor.stop()
+        self.watchdog.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.press_scheduler.close(self.stop_timeout)
+        self.modbus_client.close()
+        self.root.destroy()
@@ -0,0 +1,162 @@
+import sys
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from pymodbus.exceptions import ModbusIOException
+
+# Modbus limit for a single read_holding_registers/read_input_registers (FC03/FC04) request
+MAX_REGISTERS_PER_READ = 125
+# A register costs two bytes on the wire, so only small gaps are worth bridging
+DEFAULT_MAX_GAP = 16
+
+TABLES = {"hr": "read_holding_registers", "ir": "read_input_registers"}
+# registers per value, array typecode, numpy dtype
+TYPES = {
+    "int16": (1, "h", "i2"),
+    "uint16": (1, "H", "u2"),
+    "int32": (2, "i", "i4"),
+    "uint32": (2, "I", "u4"),
+    "float32": (2, "f", "f4"),
+}
+# Byte order of a 32-bit value AABBCCDD as it arrives in two registers: ABCD is plain big-endian,
+# CDAB swaps the words, BADC the bytes within each register and DCBA both.
+ORDERS = ("ABCD", "CDAB", "BADC", "DCBA")
+WORD_SWAPPED = ("CDAB", "DCBA")
+BYTE_SWAPPED = ("BADC", "DCBA")
+
+
+# One named value (or count values in a row) in the holding (hr) or input (ir) registers
+class RegisterChannel:
+    def __init__(self, name, table, address, dtype="int16", count=1, order="ABCD"):
+        if table not in TABLES:
+            raise ValueError(f"register channel {name}: table must be one of {', '.join(TABLES)}")
+        if dtype not in TYPES:
+            raise ValueError(f"register channel {name}: type must be one of {', '.join(TYPES)}")
+        if order not in ORDERS:
+            raise ValueError(f"register channel {name}: order must be one of {', '.join(ORDERS)}")
+        self.name = name
+        self.table = table
+        self.address = address
+        self.dtype = dtype
+        self.count = count
+        self.order = order
+        self.width = TYPES[dtype][0]
+        if not 1 <= self.size <= MAX_REGISTERS_PER_READ:
+            raise ValueError(f"register channel {name}: 1-{MAX_REGISTERS_PER_READ} registers per channel")
+
+    @property
+    def size(self):
+        return self.width * self.count
+
+    @property
+    def layout(self):
+        return self.dtype, self.order
+
+
+def parse_register_channel(text):
+    # NAME=TABLE:ADDRESS[:TYPE[:COUNT[:ORDER]]], e.g. force=ir:100:float32:4:CDAB
+    name, _, spec = text.partition("=")
+    fields = spec.split(":")
+    if not name or len(fields) < 2:
+        raise ValueError(f"register channel '{text}': expected NAME=TABLE:ADDRESS[:TYPE[:COUNT[:ORDER]]]")
+    table, address, *rest = fields
+    dtype = rest[0] if rest else "int16"
+    count = int(rest[1]) if len(rest) > 1 else 1
+    order = rest[2].upper() if len(rest) > 2 else "ABCD"
+    return RegisterChannel(name.strip(), table.lower(), int(address), dtype.lower(), count, order)
+
+
+def parse_register_channels(text):
+    channels = [parse_register_channel(item) for item in text.split(",") if item.strip()]
+    names = [channel.name for channel in channels]
+    if len(set(names)) != len(names):
+        raise ValueError("register channel names must be unique")
+    return channels
+
+
+def plan_register_ranges(channels, max_gap=DEFAULT_MAX_GAP, max_count=MAX_REGISTERS_PER_READ):
+    # Like plan_coil_ranges, but a channel is never split across two reads
+    ranges = []
+    for channel in sorted(channels, key=lambda channel: (channel.table, channel.address)):
+        end = channel.address + channel.size
+        if ranges:
+            table, start, count = ranges[-1]
+            if (table == channel.table and channel.address - (start + count) <= max_gap
+                    and end - start <= max_count):
+                ranges[-1] = (table, start, max(count, end - start))
+                continue
+        ranges.append((channel.table, channel.address, channel.size))
+    return ranges
+
+
+@lru_cache(maxsize=None)
+def load_numpy():
+    # imported on the first decode, so a launch without register channels never pays for it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def decode_registers(registers, dtype="int16", order="ABCD"):
+    # Whole blocks at once: the result is a numpy array if numpy is installed, else an array.array
+    width, typecode, numpy_type = TYPES[dtype]
+    numpy = load_numpy()
+    if numpy is not None:
+        words = numpy.asarray(registers, dtype=numpy.uint16)
+        if order in BYTE_SWAPPED:
+            words = words.byteswap()
+        if width == 2 and order in WORD_SWAPPED:
+            words = words.reshape(-1, 2)[:, ::-1]
+        return numpy.ascontiguousarray(words, dtype=">u2").reshape(-1).view(">" + numpy_type).astype(numpy_type)
+
+    words = array("H", registers)
+    if order in BYTE_SWAPPED:
+        words.byteswap()
+    if width == 2 and order in WORD_SWAPPED:
+        words[0::2], words[1::2] = words[1::2], words[0::2]
+    if sys.byteorder == "little":
+        words.byteswap()
+    values = array(typecode)
+    values.frombytes(words.tobytes())
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values
+
+
+def decode_channels(channels, blocks):
+    # blocks: [(table, start, registers)] sorted as planned. Every channel of one type and order
+    # is gathered into one run and decoded in a single call, however many blocks it spans.
+    starts = [(table, start) for table, start, _ in blocks]
+    groups = {}
+    for channel in channels:
+        table, start, registers = blocks[bisect_right(starts, (channel.table, channel.address)) - 1]
+        offset = channel.address - start
+        members, words = groups.setdefault(channel.layout, ([], array("H")))
+        members.append(channel)
+        words.extend(registers[offset:offset + channel.size])
+
+    values = {}
+    for (dtype, order), (members, words) in groups.items():
+        decoded = decode_registers(words, dtype, order)
+        position = 0
+        for channel in members:
+            values[channel.name] = decoded[position:position + channel.count]
+            position += channel.count
+    return values
+
+
+def read_register_values(client, channels, max_gap=DEFAULT_MAX_GAP):
+    # {name: values}; values is a typed array with channel.count entries
+    blocks = []
+    for table, start, count in plan_register_ranges(channels, max_gap):
+        result = getattr(client, TABLES[table])(start, count)
+        if result.isError():
+            raise ModbusIOException(f"{TABLES[table]}({start}, {count}) failed: {result}")
+        blocks.append((table, start, array("H", result.registers)))
+    return decode_channels(channels, blocks)
+
+
+def format_values(values):
+    return " ".join(f"{value:g}" if isinstance(value, float) else str(value) for value in values.tolist())
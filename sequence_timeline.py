@@ -0,0 +1,166 @@
+from coil_batch import plan_coil_writes
+
+# Recipe files describe a test as steps, one per line ('#' starts a comment):
+#
+#   press 1 2.0          press button 1 for 2 s
+#   press 1+3 0.5        press buttons 1 and 3 together for 0.5 s
+#   wait 1.0
+#   repeat 10            repeat the enclosed steps 10 times
+#     press 2 1
+#   end
+#   parallel             every enclosed step starts at the same time;
+#     press 4 3          the block lasts as long as its longest step
+#     series             steps inside a series run one after another
+#       wait 1
+#       press 2 0.5
+#     end
+#   end
+#
+# Buttons are numbered from 1 like in the GUIs. A press switches the coil on and
+# back off; it does not toggle from the current state like a manual click does.
+# A press lasts longer than 0 s, and two presses of one button may touch but not overlap.
+
+
+def parse_recipe(text):
+    root = ("series", [])
+    stack = [root]
+    for number, line in enumerate(text.splitlines(), 1):
+        words = line.split('#', 1)[0].split()
+        if not words:
+            continue
+        keyword, args = words[0].lower(), words[1:]
+        try:
+            if keyword == "press" and len(args) == 2:
+                buttons = [int(button) for button in args[0].split('+')]
+                seconds = duration(args[1])
+                if seconds == 0:
+                    raise ValueError("a press needs a duration above 0")
+                stack[-1][-1].append(("press", buttons, seconds))
+            elif keyword == "wait" and len(args) == 1:
+                stack[-1][-1].append(("wait", duration(args[0])))
+            elif keyword == "repeat" and len(args) == 1:
+                block = ("repeat", int(args[0]), [])
+                stack[-1][-1].append(block)
+                stack.append(block)
+            elif keyword in ("parallel", "series") and not args:
+                block = (keyword, [])
+                stack[-1][-1].append(block)
+                stack.append(block)
+            elif keyword == "end" and not args and len(stack) > 1:
+                stack.pop()
+            else:
+                raise ValueError(f"cannot parse '{line.strip()}'")
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+    if len(stack) > 1:
+        raise ValueError(f"'{stack[-1][0]}' block is missing its 'end'")
+    return root
+
+
+def duration(text):
+    seconds = float(text)
+    if seconds < 0:
+        raise ValueError(f"negative duration {text}")
+    return seconds
+
+
+class Timeline:
+    def __init__(self, steps, duration, coils):
+        # steps: [(offset, {coil: state}, write runs)] sorted by offset
+        self.steps = steps
+        self.duration = duration
+        self.coils = coils
+
+    @property
+    def frames(self):
+        return sum(len(runs) for _, _, runs in self.steps)
+
+
+def compile_recipe(recipe, coil_numbers):
+    edges = []
+    length = schedule(recipe, 0.0, coil_numbers, edges)
+    if length <= 0:
+        raise ValueError("recipe has zero length")
+    check_overlaps(edges, coil_numbers)
+    # at one offset a press's off edge goes before the on edge of a press that starts there,
+    # whatever order the recipe declared them in
+    edges.sort(key=lambda edge: (edge[0], edge[2]))
+    return timeline_from_edges(edges, length)
+
+
+def check_overlaps(edges, coil_numbers):
+    # schedule() appends every press as its on and off edge; a second press of a coil that starts
+    # before the first one ends would have its coil switched off early by the first press
+    presses = {}
+    for (start, coil, _), (end, _, _) in zip(edges[0::2], edges[1::2]):
+        presses.setdefault(coil, []).append((start, end))
+    for coil, spans in presses.items():
+        spans.sort()
+        for (start, end), (next_start, _) in zip(spans, spans[1:]):
+            if next_start < end:
+                raise ValueError(f"button {coil_numbers.index(coil) + 1} is pressed again at {next_start:g} s "
+                                 f"while its press from {start:g} s lasts until {end:g} s")
+
+
+def timeline_from_edges(edges, length=None):
+    # edges: (offset, coil, state). A coil that changes twice at one offset (a press right after
+    # another, or a recorded click shorter than the rounding) gets a second step at that offset,
+    # so both edges are written, in the order they were given.
+    edges = sorted(edges, key=lambda edge: edge[0])
+    merged = []
+    for offset, coil, state in edges:
+        if not merged or merged[-1][0] != offset or coil in merged[-1][1]:
+            merged.append((offset, {}))
+        merged[-1][1][coil] = state
+
+    coils = sorted({coil for _, coil, _ in edges})
+    commanded = dict.fromkeys(coils, False)
+    steps = []
+    for offset, states in merged:
+        commanded.update(states)
+        steps.append((offset, states, plan_step_writes(states, commanded)))
+    if length is None:
+        length = edges[-1][0] if edges else 0.0
+    return Timeline(steps, length, coils)
+
+
+def schedule(node, start, coil_numbers, edges):
+    kind = node[0]
+    if kind == "press":
+        end = start + node[2]
+        for button in node[1]:
+            if not 1 <= button <= len(coil_numbers):
+                raise ValueError(f"button {button} does not exist (1-{len(coil_numbers)})")
+            coil = coil_numbers[button - 1]
+            # rounded so that offsets equal on paper (0.1 + 0.2 vs 0.3) share one step
+            edges.append((round(start, 6), coil, True))
+            edges.append((round(end, 6), coil, False))
+        return end
+    if kind == "wait":
+        return start + node[1]
+    if kind == "parallel":
+        return max([schedule(child, start, coil_numbers, edges) for child in node[1]], default=start)
+    children = node[1] if kind == "series" else node[2]
+    for _ in range(node[1] if kind == "repeat" else 1):
+        for child in children:
+            start = schedule(child, start, coil_numbers, edges)
+    return start
+
+
+def plan_step_writes(states, commanded):
+    # Recipe coils that sit between two changing coils are rewritten with their current
+    # commanded state, so e.g. coils 1 and 3 switching together become one write_coils frame.
+    low, high = min(states), max(states)
+    span = {coil: state for coil, state in commanded.items() if low <= coil <= high}
+    runs = []
+    for start, values in plan_coil_writes(span):
+        changed = [start + i for i in range(len(values)) if start + i in states]
+        if changed:
+            first, last = changed[0], changed[-1]
+            runs.append((first, values[first - start:last - start + 1]))
+    return runs
+
+
+def load_timeline(path, coil_numbers):
+    with open(path) as recipe_file:
+        return compile_recipe(parse_recipe(recipe_file.read()), coil_numbers)
@@ -0,0 +1,44 @@
+import time
+
+
+# Edges are scheduled at absolute offsets from the start of the run, so Modbus
+# latency and sleep jitter of one step never push back the steps after it.
+# With a stop event (threading.Event) every wait ends the moment it is set.
+class DeadlineTimer:
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, histogram=None, stop=None):
+        self.clock = clock
+        self.sleep = sleep
+        self.stop = stop
+        # optional metrics.LatencyHistogram that every edge's lateness is recorded into
+        self.histogram = histogram
+        self.start = clock()
+        self.edges = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.last_lateness = 0.0
+
+    def sleep_until(self, offset):
+        # True once the deadline is reached, False if the stop event cut the wait short
+        remaining = self.start + offset - self.clock()
+        if self.stop is not None:
+            return not self.stop.wait(max(remaining, 0))
+        if remaining > 0:
+            self.sleep(remaining)
+        return True
+
+    def edge(self, offset):
+        lateness = self.clock() - (self.start + offset)
+        self.edges += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.last_lateness = lateness
+        if self.histogram is not None:
+            self.histogram.record(int(lateness * 1e9))
+        return lateness
+
+    def summary(self):
+        if not self.edges:
+            return "Edge lateness: -"
+        mean = self.total_lateness / self.edges
+        return (f"Edge lateness: last {self.last_lateness * 1000:.1f} ms, "
+                f"mean {mean * 1000:.1f} ms, max {self.max_lateness * 1000:.1f} ms ({self.edges} edges)")
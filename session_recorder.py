@@ -0,0 +1,90 @@
+import struct
+import threading
+import time
+from sequence_timeline import timeline_from_edges
+
+# Append-only session log: fixed 13-byte records of (offset seconds, coil, state).
+# Every recording session starts with a marker record whose offset field holds the wall clock
+# time; the offsets after it are time.monotonic() seconds since that marker.
+RECORD = struct.Struct("<dIB")
+SEGMENT = 0xFFFFFFFF
+
+
+class SessionRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        self.start = time.monotonic()
+        self.edges = 0
+        # last recorded state of every coil; coils not recorded yet count as OFF
+        self.states = {}
+        # close() may come from the Tk thread while a press worker is recording
+        self.lock = threading.Lock()
+        self.write(time.time(), SEGMENT, 0)
+
+    def record(self, coil, state):
+        with self.lock:
+            if self.file.closed:
+                return
+            self.write(time.monotonic() - self.start, coil, state)
+            self.states[coil] = bool(state)
+            self.edges += 1
+
+    def write(self, offset, coil, state):
+        self.file.write(RECORD.pack(offset, coil, 1 if state else 0))
+        # one flush per edge: manual presses are rare and a crash should lose nothing
+        self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+# Event sink in front of the UI queue; while recorder is set, every coil edge is also logged.
+# A ("states", {coil: state}) event, e.g. the read-back after Stop, is logged for the coils it
+# changes since their last recorded edge. A failing recording is reported as an error event
+# and never raises into the press that posted the edge.
+class RecordingSink:
+    def __init__(self, events):
+        self.events = events
+        self.recorder = None
+
+    def put(self, event):
+        recorder = self.recorder
+        try:
+            if recorder is not None and event[0] == "state":
+                recorder.record(event[1], event[2])
+            elif recorder is not None and event[0] == "states":
+                for coil, state in event[1].items():
+                    if recorder.states.get(coil, False) != bool(state):
+                        recorder.record(coil, state)
+        except (OSError, ValueError) as e:
+            self.events.put(("error", f"Recording to {recorder.path} failed: {e}"))
+        self.events.put(event)
+
+
+def read_session(path):
+    # Segments are laid end to end, each one starting where the previous one's last edge was
+    edges = []
+    base = segment_end = 0.0
+    with open(path, "rb") as session_file:
+        data = session_file.read()
+    usable = len(data) - len(data) % RECORD.size
+    for offset, coil, state in RECORD.iter_unpack(data[:usable]):
+        if coil == SEGMENT:
+            base = segment_end
+        else:
+            segment_end = base + offset
+            edges.append((segment_end, coil, bool(state)))
+    return edges
+
+
+def load_session_timeline(path, speed=1.0, coil_map=None):
+    if speed <= 0:
+        raise ValueError("replay speed must be positive")
+    coil_map = coil_map or {}
+    edges = [(round(offset / speed, 6), coil_map.get(coil, coil), state)
+             for offset, coil, state in read_session(path)]
+    if not edges:
+        raise ValueError(f"{path} contains no recorded presses")
+    return timeline_from_edges(edges)
@@ -0,0 +1,44 @@
+import unittest
+from sequence_timeline import compile_recipe, parse_recipe
+
+COILS = [10, 11, 12]
+
+
+def steps(text):
+    return [(offset, states) for offset, states, _ in compile_recipe(parse_recipe(text), COILS).steps]
+
+
+class CompileRecipeTest(unittest.TestCase):
+    def test_parallel_presses(self):
+        self.assertEqual(steps("parallel\npress 1 1\npress 2 2\nend"),
+                         [(0.0, {10: True, 11: True}), (1.0, {10: False}), (2.0, {11: False})])
+
+    def test_back_to_back_presses(self):
+        self.assertEqual(steps("press 1 1\npress 1 1"),
+                         [(0.0, {10: True}), (1.0, {10: False}), (1.0, {10: True}), (2.0, {10: False})])
+
+    def test_back_to_back_presses_declared_out_of_order(self):
+        # the press starting at 1 s is declared before the one ending there
+        self.assertEqual(steps("parallel\nseries\nwait 1\npress 1 1\nend\npress 1 1\nend"),
+                         [(0.0, {10: True}), (1.0, {10: False}), (1.0, {10: True}), (2.0, {10: False})])
+
+    def test_repeat(self):
+        timeline = compile_recipe(parse_recipe("repeat 3\npress 2 0.5\nwait 0.5\nend"), COILS)
+        self.assertEqual(len(timeline.steps), 6)
+        self.assertEqual(timeline.duration, 3.0)
+
+    def test_zero_length_press_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "line 1"):
+            parse_recipe("press 2 0")
+
+    def test_overlapping_presses_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, "button 1 is pressed again"):
+            steps("parallel\npress 1 3\nseries\nwait 1\npress 1 1\nend\nend")
+
+    def test_unknown_button_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "button 4 does not exist"):
+            steps("press 4 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Priority classes, most urgent first. A thread's transactions run at the class set with
+# ModbusConnection.priority(); anything else runs as PRESS.
+EMERGENCY = 0  # releasing coils on Stop
+EDGE = 1       # timed sequence edges
+PRESS = 2      # user presses
+POLL = 3       # background state reads
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate / 10)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def delay(self):
+        # seconds until a whole token is available
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        # EMERGENCY takes a token even when none is left; the debt delays the traffic after it
+        self.tokens -= 1
+
+
+# Hands out the pooled clients of one device in priority order (FIFO within a class),
+# with an optional token-bucket limit on transactions per second. POLL never takes the
+# last idle client, so an edge or a Stop does not queue behind a refresh of many ranges.
+class TransactionScheduler:
+    def __init__(self, clients, rate=None, burst=None):
+        # LIFO so the most recently used (already open) socket is handed out first
+        self.idle = list(clients)
+        self.reserve = 1 if len(self.idle) > 1 else 0
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+
+    def checkout(self, priority=PRESS):
+        entry = (priority, next(self.sequence))
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    delay = self.ready(entry)
+                    if delay == 0:
+                        heapq.heappop(self.waiting)
+                        if self.bucket:
+                            self.bucket.take()
+                        client = self.idle.pop()
+                        self.condition.notify_all()
+                        return client
+                    self.condition.wait(delay)
+            except BaseException:
+                if entry in self.waiting:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.condition.notify_all()
+                raise
+
+    def ready(self, entry):
+        # 0 when entry may go now, else how long to wait (None: until a checkin)
+        if self.waiting[0] != entry:
+            return None
+        priority = entry[0]
+        if len(self.idle) <= (self.reserve if priority == POLL else 0):
+            return None
+        if self.bucket is None or priority == EMERGENCY:
+            return 0
+        return self.bucket.delay() or 0
+
+    def checkin(self, client):
+        with self.condition:
+            self.idle.append(client)
+            self.condition.notify_all()
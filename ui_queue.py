@@ -0,0 +1,40 @@
+import queue
+
+
+class UiFrame:
+    def __init__(self):
+        self.states = {}
+        self.registers = {}
+        self.edges = 0
+        self.errors = []
+        self.events = []
+
+
+# Worker threads put() events here; only the Tk loop drains it, once per frame.
+# A burst of state changes collapses into one {coil: state} map and one repaint.
+class UiEventQueue:
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+
+    def put(self, event):
+        self.queue.put(event)
+
+    def drain(self):
+        frame = UiFrame()
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                return frame
+            if event[0] == "state":
+                frame.states[event[1]] = event[2]
+                frame.edges += 1
+            elif event[0] == "states":
+                frame.states.update(event[1])
+            elif event[0] == "registers":
+                frame.registers.update(event[1])
+            elif event[0] == "error":
+                if event[1] not in frame.errors:
+                    frame.errors.append(event[1])
+            else:
+                frame.events.append(event)